@@ -0,0 +1,16 @@
+import sys
+
+# Entry points run as 'python3 -m anno_app COMMAND'. Each command imports
+# only what it needs, so short ones like capture start quickly.
+USAGE = "Usage: python3 -m anno_app capture"
+
+def main(args):
+    command = args[0] if args else None
+    if command == "capture":
+        from anno_app.anno_capture import capture
+        return 0 if capture() else 1
+    print(USAGE, file=sys.stderr)
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
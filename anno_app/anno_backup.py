@@ -0,0 +1,282 @@
+import os
+import json
+import zlib
+import fcntl
+import hashlib
+from datetime import datetime
+from contextlib import contextmanager
+
+from anno_app.anno_profile import profiled
+
+# --- Repository Layout ---
+# Backups are kept as a content-addressed repository:
+#
+#   objects/ab/cdef...   zlib-compressed blobs, named by the SHA-256 of their
+#                        uncompressed bytes: note contents, and chunks of a
+#                        snapshot's note list
+#   snapshots/NAME.json  one small manifest per backup, listing its chunks
+#   catalog.json         what each snapshot holds, gathered from their
+#                        manifests so backups can be listed in one read
+#   lock                 held while a backup is written or old ones are
+#                        pruned, so pruning never deletes a blob that a
+#                        backup in progress is counting on
+#
+# A note's content is stored once however many backups include it, and a
+# chunk of BACKUP_CHUNK_NOTES notes is only stored again once one of them
+# changes, so a backup of a mostly unchanged store costs very little.
+BACKUP_FORMAT_VERSION = 1
+BACKUP_CHUNK_NOTES = 1000
+SNAPSHOT_PREFIX = "anno_backup_"
+CATALOG_FIELDS = ("created", "count", "size", "stored", "checksum", "newest")
+
+def blob_hash(data):
+    """Returns the name of the blob holding data."""
+    return hashlib.sha256(data).hexdigest()
+
+def snapshot_checksum(chunks):
+    """Returns a checksum covering every note of a snapshot, through its chunks' hashes."""
+    return blob_hash("\n".join(chunks).encode())
+
+def write_json(path, data):
+    """Writes data as JSON, replacing the file in a single step."""
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+class BackupRepository:
+    """Deduplicated backups of the notes, stored under one directory."""
+    def __init__(self, path):
+        self.path = path
+        self.objects_dir = os.path.join(path, "objects")
+        self.snapshots_dir = os.path.join(path, "snapshots")
+        self.catalog_path = os.path.join(path, "catalog.json")
+        self.lock_path = os.path.join(path, "lock")
+
+    @contextmanager
+    def locked(self):
+        """Holds the repository's lock exclusively, for writing snapshots or pruning."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    # --- Blobs ---
+
+    def blob_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def stored_blobs(self):
+        """Returns the names of every stored blob, listing each fan-out directory once."""
+        if not os.path.isdir(self.objects_dir):
+            return set()
+        return {prefix + name
+                for prefix in os.listdir(self.objects_dir)
+                for name in os.listdir(os.path.join(self.objects_dir, prefix))
+                if not name.endswith(".tmp")}
+
+    def put_blob(self, data, stored=None):
+        """Stores data unless an identical blob exists already.
+
+        Returns the blob's name and the number of bytes newly written.
+        """
+        digest = blob_hash(data)
+        if stored is not None and digest in stored:
+            return digest, 0
+        path = self.blob_path(digest)
+        written = 0
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            compressed = zlib.compress(data)
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+            written = len(compressed)
+        if stored is not None: stored.add(digest)
+        return digest, written
+
+    def get_blob(self, digest):
+        """Returns a blob's bytes, checking them against its name."""
+        with open(self.blob_path(digest), "rb") as f:
+            data = zlib.decompress(f.read())
+        if blob_hash(data) != digest:
+            raise ValueError(f"Backup blob {digest} is corrupt")
+        return data
+
+    # --- Snapshots ---
+
+    def snapshot_path(self, name):
+        return os.path.join(self.snapshots_dir, name + ".json")
+
+    def snapshots(self):
+        """Returns the names of all snapshots, newest first."""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        names = [f[:-5] for f in os.listdir(self.snapshots_dir) if f.startswith(SNAPSHOT_PREFIX) and f.endswith(".json")]
+        return sorted(names, reverse=True)
+
+    @profiled("backup.write")
+    def write_snapshot(self, notes, reuse_unchanged=False):
+        """Backs up notes (dicts with content, timestamp and id) and returns the snapshot's name.
+
+        With reuse_unchanged, notes identical to those of an existing snapshot
+        are not backed up again; the newest such snapshot is returned instead.
+        """
+        with self.locked():
+            stored = self.stored_blobs()
+            entries, chunks = [], []
+            size = written = 0
+            for note in notes:
+                content = note.get("content", "").encode()
+                digest, blob_written = self.put_blob(content, stored)
+                entries.append([note["id"], note["timestamp"], digest])
+                size += len(content)
+                written += blob_written
+            for i in range(0, len(entries), BACKUP_CHUNK_NOTES):
+                digest, blob_written = self.put_blob(json.dumps(entries[i:i + BACKUP_CHUNK_NOTES]).encode(), stored)
+                chunks.append(digest)
+                written += blob_written
+            checksum = snapshot_checksum(chunks)
+            if reuse_unchanged:
+                # Matching checksums mean every note is already stored, unchanged.
+                for name, entry in self.catalog().items():
+                    if entry.get("checksum") == checksum:
+                        return name
+            newest = max(notes, key=lambda note: note["timestamp"], default=None)
+
+            created = datetime.now()
+            name = SNAPSHOT_PREFIX + created.strftime("%Y-%m-%d_%H-%M-%S")
+            # Backups taken within the same second get a counter.
+            suffix = 1
+            while os.path.exists(self.snapshot_path(name if suffix == 1 else f"{name}_{suffix}")):
+                suffix += 1
+            if suffix > 1: name = f"{name}_{suffix}"
+
+            os.makedirs(self.snapshots_dir, exist_ok=True)
+            write_json(self.snapshot_path(name), {
+                "version": BACKUP_FORMAT_VERSION,
+                "created": created.isoformat(),
+                "count": len(entries),
+                # Bytes of note content backed up, and compressed bytes this
+                # backup added to the repository.
+                "size": size,
+                "stored": written,
+                "checksum": checksum,
+                "newest": newest and {"title": newest.get("content", "").split("\n", 1)[0],
+                                      "timestamp": newest["timestamp"]},
+                "chunks": chunks,
+            })
+            self.catalog()
+            return name
+
+    def read_manifest(self, name):
+        with open(self.snapshot_path(name)) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != BACKUP_FORMAT_VERSION:
+            raise ValueError(f"{name} was written by an unsupported version of anno")
+        return manifest
+
+    def snapshot_entries(self, name):
+        """Returns a snapshot's [id, timestamp, blob] entries, without reading any note.
+
+        Raises ValueError if the entries don't match the snapshot's checksum
+        and note count, or aren't well-formed records.
+        """
+        manifest = self.read_manifest(name)
+        if snapshot_checksum(manifest["chunks"]) != manifest.get("checksum"):
+            raise ValueError(f"{name} does not match its checksum")
+        entries = []
+        for chunk in manifest["chunks"]:
+            entries += json.loads(self.get_blob(chunk))
+        if len(entries) != manifest.get("count"):
+            raise ValueError(f"{name} should hold {manifest.get('count')} notes but lists {len(entries)}")
+        for entry in entries:
+            if len(entry) != 3 or not all(isinstance(field, str) for field in entry):
+                raise ValueError(f"{name} holds a malformed note record: {entry!r}")
+            datetime.fromisoformat(entry[1])
+        if len({entry[0] for entry in entries}) != len(entries):
+            raise ValueError(f"{name} holds the same note id twice")
+        return entries
+
+    @profiled("backup.read")
+    def read_snapshot(self, name):
+        """Returns the notes a snapshot holds, in the order they were backed up.
+
+        Everything read is verified: the snapshot's checksum, and every note
+        against the hash it is stored under.
+        """
+        return [{"content": self.get_blob(digest).decode(), "timestamp": timestamp, "id": key}
+                for key, timestamp, digest in self.snapshot_entries(name)]
+
+    # --- Catalog ---
+
+    def catalog(self):
+        """Returns what each snapshot holds, by name, without reading any notes.
+
+        The catalog file is brought up to date with the snapshots on disk,
+        reading the manifest of any snapshot it does not list yet.
+        """
+        try:
+            with open(self.catalog_path) as f:
+                catalog = json.load(f)
+            if catalog.get("version") != BACKUP_FORMAT_VERSION: catalog = None
+        except (OSError, ValueError):
+            catalog = None
+        entries = catalog["backups"] if catalog else {}
+
+        names = self.snapshots()
+        changed = catalog is None or set(entries) != set(names)
+        entries = {name: entries.get(name) for name in names}
+        for name in names:
+            if entries[name] is None:
+                try:
+                    manifest = self.read_manifest(name)
+                except (OSError, ValueError):
+                    # Shown as unreadable; restoring it reports the error.
+                    entries[name] = {}
+                    continue
+                entries[name] = {field: manifest.get(field) for field in CATALOG_FIELDS}
+        if changed and names:
+            try:
+                write_json(self.catalog_path, {"version": BACKUP_FORMAT_VERSION, "backups": entries})
+            except OSError:
+                pass
+        return entries
+
+    # --- Retention ---
+
+    def prune(self, keep_last, keep_daily):
+        """Deletes old snapshots, then every blob no remaining snapshot uses.
+
+        The newest keep_last snapshots are kept, plus the newest snapshot of
+        each of the keep_daily most recent days that have one. Returns the
+        number of snapshots and blobs removed.
+        """
+        with self.locked():
+            names = self.snapshots()
+            keep = set(names[:keep_last])
+            days = []
+            for name in names:
+                day = name[len(SNAPSHOT_PREFIX):len(SNAPSHOT_PREFIX) + 10]
+                if day not in days:
+                    days.append(day)
+                    if len(days) <= keep_daily: keep.add(name)
+            removed_snapshots = [name for name in names if name not in keep]
+            for name in removed_snapshots:
+                os.remove(self.snapshot_path(name))
+            self.catalog()
+
+            # Mark every blob the kept snapshots reach, then sweep the rest.
+            reachable = set()
+            for name in keep:
+                manifest = self.read_manifest(name)
+                reachable.update(manifest["chunks"])
+                for chunk in manifest["chunks"]:
+                    reachable.update(digest for _, _, digest in json.loads(self.get_blob(chunk)))
+            removed_blobs = 0
+            for digest in self.stored_blobs() - reachable:
+                os.remove(self.blob_path(digest))
+                removed_blobs += 1
+            return len(removed_snapshots), removed_blobs
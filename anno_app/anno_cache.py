@@ -0,0 +1,356 @@
+import os
+import sys
+import atexit
+import pickle
+from datetime import datetime, timedelta, timezone
+
+from anno_app.anno_store import JournalStore, parse_note_content, note_id
+from anno_app.anno_index import JournalIndex
+from anno_app.anno_profile import span
+
+# --- Configuration ---
+# Parsed notes are cached here, one file per store, so a cold start can skip
+# decoding and parsing the whole corpus when nothing has changed.
+CACHE_DIR = os.path.expanduser("~/.cache/anno")
+# Bumped whenever the layout of a cached record changes.
+CACHE_VERSION = 3
+# Small journal catch-ups are cheap to replay on the next start, so the cache
+# file is only rewritten once this many journal bytes have been applied.
+PERSIST_EVERY_BYTES = 256 * 1024
+# Other stores have no journal to catch up from, so the cache's own writes
+# are saved every this many, and whatever is left when the process exits.
+PERSIST_EVERY_WRITES = 64
+# Notes are reparsed in batches of this many, newest first, so a viewer can
+# show the first ones while the rest are still being parsed.
+PARSE_BATCH_SIZE = 5000
+
+# --- Parsed Notes ---
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+NAIVE_EPOCH = datetime(1970, 1, 1)
+
+def timestamp_epoch(timestamp):
+    """Converts a note timestamp to integer microseconds since the epoch."""
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is None: dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+def epoch_timestamp(epoch):
+    """Formats microseconds since the epoch the way the capture script writes timestamps."""
+    # Gives the same text as strftime("%Y-%m-%dT%H:%M:%S.%fZ"), in half the time.
+    return (NAIVE_EPOCH + timedelta(microseconds=epoch)).isoformat(timespec="microseconds") + "Z"
+
+class Note:
+    """A parsed note, kept small since the viewers hold every one in memory.
+
+    The content is stored once; the title and body are offsets into it, tags
+    are interned, and the timestamp is an integer (microseconds since the
+    epoch). The timestamp string is rebuilt from it on demand, unless the
+    note was written in another format, in which case that string is kept.
+    """
+    __slots__ = ("id", "epoch", "content", "title_end", "body_start", "tags", "_timestamp")
+
+    def __init__(self, key, timestamp, content):
+        title, tags, body = parse_note_content(content)
+        self.id = key
+        self.epoch = timestamp_epoch(timestamp)
+        self._timestamp = None if epoch_timestamp(self.epoch) == timestamp else timestamp
+        self.content = content
+        self.title_end = len(title)
+        self.body_start = len(content) - len(body)
+        self.tags = tuple(sys.intern(tag) for tag in tags)
+
+    @property
+    def timestamp(self):
+        """When the note was captured, as written in the store."""
+        return self._timestamp or epoch_timestamp(self.epoch)
+
+    @property
+    def datetime(self):
+        if self._timestamp: return datetime.fromisoformat(self._timestamp)
+        return EPOCH + timedelta(microseconds=self.epoch)
+
+    @property
+    def title(self):
+        return self.content[:self.title_end]
+
+    @property
+    def body(self):
+        """The note's text without its title and tag lines."""
+        return self.content[self.body_start:]
+
+    def __reduce__(self):
+        # A flat tuple pickles smaller and loads faster than the slot dict.
+        return (_restore_note, (self.id, self.epoch, self.content, self.title_end, self.body_start, self.tags, self._timestamp))
+
+def _restore_note(key, epoch, content, title_end, body_start, tags, timestamp):
+    note = Note.__new__(Note)
+    note.id, note.epoch, note.content, note._timestamp = key, epoch, content, timestamp
+    note.title_end, note.body_start = title_end, body_start
+    note.tags = tuple(sys.intern(tag) for tag in tags)
+    return note
+
+def parse_note(note):
+    """Parses a stored note into the record the viewers display from."""
+    return Note(note_id(note), note["timestamp"], note.get("content", ""))
+
+# --- Note Cache ---
+
+class NoteCache(JournalIndex):
+    """Keeps every note parsed and sorted newest first, in memory and on disk.
+
+    The cache is stamped with the identity (inode, mtime, size) of the store's
+    files. For the JSON store, changes appended to the journal since then are
+    applied to the cached records one by one; anything else reparses the
+    store once. Reading from a current cache only costs a few stat calls.
+    """
+    span_name = "cache"
+
+    def __init__(self, store, path=None):
+        super().__init__(store, path or os.path.join(CACHE_DIR, os.path.basename(store.path) + ".cache"))
+        self.records = []
+        # The same records by note id, for O(1) lookups, edits and deletes.
+        self.by_id = {}
+        self.stamp = None
+        self._loaded = False
+        self._persisted_stamp = None
+        # Writes applied by note_changed/notes_added that aren't on disk yet.
+        self._unpersisted_writes = 0
+        self.on_parsed = None
+        # While refresh() runs: the record each changed note had before it.
+        self._changes = None
+
+    def notes(self, on_parsed=None):
+        """Returns every parsed note, newest first.
+
+        If the notes have to be parsed again, on_parsed(batch, total) is
+        called with each batch of records, newest first, as soon as it is
+        parsed. A current cache returns without calling it.
+        """
+        self.on_parsed = on_parsed
+        try:
+            self.refresh()
+        finally:
+            self.on_parsed = None
+        return self.records
+
+    def get(self, key):
+        """Returns the parsed note with the given id, or None."""
+        return self.by_id.get(key)
+
+    def note_changed(self, key, content=None):
+        """Applies a note this process just wrote and returns its new record.
+
+        A content of None means the note was deleted. The JSON store has
+        already journaled the change, so catching up replays only that record.
+        """
+        if isinstance(self.store, JournalStore) or not self._loaded:
+            self.refresh()
+        else:
+            old = self.by_id.get(key)
+            self._remove(key)
+            if content is not None and old is not None:
+                self._insert(Note(key, old.timestamp, content))
+            self._unpersisted_writes += 1
+            self._save(self.store.generation())
+        return self.get(key)
+
+    def notes_added(self, notes):
+        """Applies notes (dicts with content, timestamp and id) this process just added."""
+        if isinstance(self.store, JournalStore) or not self._loaded:
+            self.refresh()
+            return
+        for note in notes:
+            self._insert(parse_note(note))
+        self._unpersisted_writes += 1
+        self._save(self.store.generation())
+
+    # --- Maintenance ---
+
+    def refresh(self):
+        """Brings the cache up to date with the store.
+
+        Returns the notes that changed as {id: the record before, or None for
+        a new note}, so callers can update their views of just those; the
+        current records are in by_id. After a reparse every note is listed.
+        """
+        self._changes = changes = {}
+        try:
+            self._catch_up()
+        finally:
+            self._changes = None
+        return changes
+
+    def _catch_up(self):
+        if isinstance(self.store, JournalStore):
+            super().refresh()
+            if self.store.ids_repaired:
+                # Notes sharing an id were given distinct ones; write them,
+                # once no lock is held.
+                try: self.store.compact()
+                except OSError: pass
+            return
+        # Other stores have no journal to replay; any change reloads them.
+        with span(self.span_name):
+            stamp = self._load()
+            current = self.store.generation()
+            if stamp != current:
+                notes = self.store.load(newest_first=True)
+                self._set_records(self._parse(notes))
+                self._unpersisted_writes = 0
+                self._save(current)
+
+    def rebuild(self):
+        """Reparses every note. Callers must hold the store's journal lock."""
+        notes = self.store._replay()
+        with span("sort"):
+            # Sorted before parsing, so the newest notes are ready first.
+            notes.sort(key=lambda note: timestamp_epoch(note["timestamp"]), reverse=True)
+        self._set_records(self._parse(notes))
+        self._save(self._current_stamp(self.store.read_journal()[1]))
+
+    def _parse(self, notes):
+        """Parses newest-first notes in batches, handing each to on_parsed when set."""
+        records = []
+        with span("parse"):
+            for i in range(0, len(notes), PARSE_BATCH_SIZE):
+                batch = [parse_note(note) for note in notes[i:i + PARSE_BATCH_SIZE]]
+                records += batch
+                if self.on_parsed: self.on_parsed(batch, len(notes))
+        return records
+
+    def _position(self, epoch):
+        """Binary-searches the newest-first records for a timestamp's slot."""
+        lo, hi = 0, len(self.records)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.records[mid].epoch > epoch:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _set_records(self, records):
+        if self._changes is not None:
+            # Every note may have changed; callers compare the records to tell.
+            for key, record in self.by_id.items():
+                self._changes.setdefault(key, record)
+            for record in records:
+                self._changes.setdefault(record.id, None)
+        self.records = records
+        self.by_id = {record.id: record for record in records}
+
+    def _insert(self, record):
+        self.records.insert(self._position(record.epoch), record)
+        self.by_id[record.id] = record
+
+    def _apply(self, record):
+        """Applies one journal record, mirroring how JournalStore replays it."""
+        op, key = record.get("op"), note_id(record)
+        old = self.by_id.get(key)
+        if self._changes is not None:
+            self._changes.setdefault(key, old)
+        if op == "add" or (op == "edit" and old is not None):
+            timestamp = record.get("timestamp") if op == "add" else old.timestamp
+            self._remove(key)
+            self._insert(Note(key, timestamp, record.get("content", "")))
+        elif op == "del":
+            self._remove(key)
+
+    def _remove(self, key):
+        record = self.by_id.pop(key, None)
+        if record is None:
+            return
+        # Notes captured in the same microsecond share a slot; find this one.
+        i = self._position(record.epoch)
+        while self.records[i] is not record:
+            i += 1
+        del self.records[i]
+
+    def _clear(self):
+        self._set_records([])
+
+    # --- Persistence ---
+
+    def _load(self):
+        """Returns the cache's stamp, reading it from disk on first use."""
+        if not self._loaded:
+            self._loaded = True
+            try:
+                with span("cache.load"), open(self.path, "rb") as f:
+                    data = pickle.load(f)
+                if data.get("version") == CACHE_VERSION and data.get("store") == self.store.path:
+                    self._set_records(data["records"])
+                    self.stamp = data["stamp"]
+                    self._persisted_stamp = self.stamp
+            except Exception:
+                # A missing, stale or corrupt cache just means parsing from scratch.
+                self._set_records([])
+                self.stamp = None
+        return self.stamp
+
+    def _worth_persisting(self, stamp):
+        persisted = self._persisted_stamp
+        if persisted is None:
+            return True
+        if "journal" not in stamp:
+            # Reloads are saved straight away; this process's own writes in batches.
+            return self._unpersisted_writes in (0, PERSIST_EVERY_WRITES)
+        if persisted.get("snapshot") != stamp["snapshot"]:
+            return True
+        return stamp["journal"][1] - persisted["journal"][1] >= PERSIST_EVERY_BYTES
+
+    def flush(self):
+        """Saves the writes _worth_persisting held back, if there are any."""
+        if self._unpersisted_writes:
+            self._unpersisted_writes = 0
+            self._save(self.stamp)
+
+    def _save(self, stamp):
+        self.stamp = stamp
+        if not self._worth_persisting(stamp):
+            return
+        self._persisted_stamp = stamp
+        self._unpersisted_writes = 0
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with span("cache.save"), open(tmp_path, "wb") as f:
+                pickle.dump({
+                    "version": CACHE_VERSION,
+                    "store": self.store.path,
+                    "stamp": stamp,
+                    "records": self.records,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # The cache is only an optimization; the in-memory copy still works.
+            pass
+
+# Caches shared by everything in this process, one per store file.
+_caches = {}
+
+def new_cache(store):
+    """Returns a parsed-note cache for a store that nothing else in the process shares."""
+    # Stores can bring their own kind of cache, like the pack store does.
+    return getattr(store, "cache_type", NoteCache)(store)
+
+def open_cache(store):
+    """Returns the process-wide parsed-note cache for a store."""
+    cache = _caches.get(store.path)
+    if cache is None:
+        cache = _caches[store.path] = new_cache(store)
+    cache.store = store
+    return cache
+
+def share_cache(cache, store):
+    """Makes a cache filled on its own, e.g. by a loader thread, the process-wide one for store."""
+    cache.store = store
+    _caches[store.path] = cache
+    return cache
+
+@atexit.register
+def flush_caches():
+    """Saves every cache's held-back writes as the process exits."""
+    for cache in _caches.values():
+        cache.flush()
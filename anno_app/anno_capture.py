@@ -0,0 +1,42 @@
+import os
+import shlex
+
+# --- Template ---
+# A new note starts out as this template. Closing the editor without
+# replacing its placeholders, or after emptying it, cancels the capture.
+TEMPLATE_TITLE = "New Annotation Title"
+TEMPLATE_TAGS = "[#tag1, #tag2]"
+TEMPLATE = f"{TEMPLATE_TITLE}\n{TEMPLATE_TAGS}\n\n\n"
+
+def is_unfilled(content):
+    """Whether the edited template holds no note: nothing, or only the placeholders."""
+    lines = [line.strip() for line in content.strip().split("\n")]
+    return lines == [""] or lines == [TEMPLATE_TITLE, TEMPLATE_TAGS]
+
+def edit_template():
+    """Opens the template in the user's $EDITOR and returns the file's path and saved text."""
+    # Like tempfile.mkstemp, without the imports: a new, private file.
+    path = os.path.join(os.environ.get("TMPDIR") or "/tmp", f"anno_{os.urandom(6).hex()}.txt")
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+        f.write(TEMPLATE)
+    # $EDITOR may carry its own arguments, just like in the shell script.
+    editor = shlex.split(os.environ.get("EDITOR") or "nano") + [path]
+    os.spawnvp(os.P_WAIT, editor[0], editor)
+    with open(path, "r") as f:
+        return path, f.read()
+
+def capture():
+    """Lets the user write a new note and saves it. Returns False if saving failed."""
+    path, content = edit_template()
+    if is_unfilled(content):
+        os.remove(path)
+        print("Annotation canceled. No changes made.")
+        return True
+
+    # The store is only imported once there is a note to save.
+    from anno_app.anno_client import capture_note
+    if not capture_note(content.rstrip("\n")):
+        print(f"Your note was kept in {path}")
+        return False
+    os.remove(path)
+    return True
@@ -0,0 +1,147 @@
+import os
+import json
+import struct
+
+from anno_app.anno_store import configured_backend, open_store
+
+# --- Configuration ---
+# Talks to 'anno --daemon' (see anno_daemon), for commands that want to be
+# answered from memory when it runs. Kept light, since capture imports it.
+# The daemon listens on a Unix socket in the user's runtime directory, which
+# only they can reach, or next to the note cache where there is none.
+SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or os.path.expanduser("~/.cache/anno"), "anno.sock")
+# Every message is a JSON object preceded by its length in bytes.
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 256 * 1024 * 1024
+# Returned to clients whose backend differs from the daemon's, which then read the files themselves.
+WRONG_BACKEND = "wrong backend"
+# Seconds to wait on each step of talking to the daemon. It answers from
+# memory, so only a stopped or stuck one takes this long.
+CLIENT_TIMEOUT = 5
+# Requests that only read, so a timed-out one is simply answered from the files.
+READ_ONLY_OPS = ("list", "read", "search")
+# Exports and backups can take a while on large stores; their answer is waited for.
+SLOW_OPS = ("export", "backup")
+
+# --- Framing ---
+
+def send_frame(sock, message):
+    data = json.dumps(message).encode()
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+def read_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+def read_frame(sock):
+    """Reads one message, or returns None if the connection closed first."""
+    header = read_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    data = read_exactly(sock, FRAME_HEADER.unpack(header)[0])
+    return None if data is None else json.loads(data)
+
+# --- Requests ---
+
+def connect():
+    """Connects to the running daemon, or returns None if there is none."""
+    if not os.path.exists(SOCKET_PATH):
+        return None
+    # Only imported when there may be a daemon; it is slow to load.
+    import socket
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Without a daemon this fails at once; with a busy one it waits its turn,
+    # up to CLIENT_TIMEOUT, rather than failing while the daemon catches up
+    # on connections. A timeout counts as no daemon, like a refusal.
+    sock.settimeout(CLIENT_TIMEOUT)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+def daemon_request(op, **args):
+    """Sends one request to the daemon and returns its response.
+
+    Returns None when no daemon is serving the active backend, in which case
+    callers read and write the files themselves.
+    """
+    sock = connect()
+    if sock is None:
+        return None
+    # Imported here for its timeout error; connect() has loaded it already.
+    import socket
+    with sock:
+        try:
+            send_frame(sock, {"op": op, "backend": configured_backend(), **args})
+        except OSError:
+            # Including timeouts: a partly sent request is never carried out.
+            return None
+        if op in SLOW_OPS:
+            sock.settimeout(None)
+        try:
+            response = read_frame(sock)
+        except socket.timeout:
+            if op in READ_ONLY_OPS:
+                return None
+            # A stuck daemon may still save the note later, so it isn't saved here too.
+            return {"ok": False, "error": "The anno daemon did not answer in time."}
+        except (OSError, ValueError):
+            response = None
+    if response is None:
+        # The request may have been carried out, so it must not be repeated.
+        return {"ok": False, "error": "The anno daemon stopped before answering."}
+    if not response["ok"] and response["error"] == WRONG_BACKEND:
+        return None
+    return response
+
+def capture_note(content):
+    """Saves a new note through the daemon if one is running, or directly otherwise."""
+    response = daemon_request("capture", content=content)
+    if response is None:
+        try:
+            store = open_store()
+            store.add(content)
+        except Exception as e:
+            # Failures of the JSON files or of the SQLite database alike.
+            print(f"Error: Could not save the note: {e}")
+            return False
+        # Captures are what grows the journal, so they fold it back in too.
+        # (A running daemon does this itself after saving.)
+        try: store.maybe_compact()
+        except (OSError, ValueError): pass
+    elif not response["ok"]:
+        print(f"Error: {response['error']}")
+        return False
+    print("Annotation saved.")
+    return True
+
+def run_export(target_dir):
+    """Exports the notes through the daemon if one is running, or directly otherwise."""
+    response = daemon_request("export", directory=os.path.abspath(target_dir))
+    if response is None:
+        from anno_app.anno_utils import export_notes
+        return export_notes(target_dir)
+    return print_result(response)
+
+def run_backup():
+    """Backs up the notes through the daemon if one is running, or directly otherwise."""
+    response = daemon_request("backup")
+    if response is None:
+        from anno_app.anno_utils import backup_notes
+        return backup_notes()
+    return print_result(response)
+
+def print_result(response):
+    """Shows what a daemon-run command printed and returns its result."""
+    if not response["ok"]:
+        print(f"Error: {response['error']}")
+        return None
+    print(response["result"]["output"], end="")
+    return response["result"]["value"]
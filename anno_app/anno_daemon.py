@@ -0,0 +1,225 @@
+import os
+import io
+import sys
+import json
+import signal
+import socket
+import sqlite3
+import selectors
+from contextlib import redirect_stdout
+
+from anno_app.anno_store import JournalStore, configured_backend, open_store
+from anno_app.anno_cache import open_cache
+from anno_app.anno_index import TagIndex, TextIndex
+from anno_app.anno_profile import profiled, span
+from anno_app.anno_client import SOCKET_PATH, FRAME_HEADER, MAX_FRAME_BYTES, WRONG_BACKEND, send_frame, connect
+
+# --- Configuration ---
+# Connections not yet accepted queue up to this many; the kernel may cap it lower.
+LISTEN_BACKLOG = 1024
+# How long the daemon waits on a client that stops reading its response.
+SEND_TIMEOUT = 10
+
+# --- Daemon ---
+
+def note_dict(note):
+    """Turns a parsed note back into the dict the stores return."""
+    return {"content": note.content, "timestamp": note.timestamp, "id": note.id}
+
+class AnnoDaemon:
+    """Serves the notes of one backend over a Unix socket, from memory.
+
+    Every note stays parsed in the note cache, and the JSON and pack stores'
+    tag and full-text indexes stay open, so a request only catches them up
+    with whatever other programs changed since the last one. Requests are
+    handled one at a time; captures received together are committed in a
+    single journal write or transaction.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.store = open_store(backend)
+        self.cache = open_cache(self.store)
+        self.cache.refresh()
+        self.tags = self.words = None
+        if isinstance(self.store, JournalStore):
+            self.tags, self.words = TagIndex.open(self.store), TextIndex.open(self.store)
+        self.selector = selectors.DefaultSelector()
+        self.buffers = {}
+        # Captures waiting to be committed, with the connection each came from.
+        self.pending = []
+
+    # --- Connections ---
+
+    def serve_forever(self, listener):
+        self.selector.register(listener, selectors.EVENT_READ)
+        while True:
+            # While captures are pending, only work that is already waiting
+            # is read before committing them all at once.
+            events = self.selector.select(0 if self.pending else None)
+            if not events:
+                self.commit()
+            for key, _ in events:
+                if key.fileobj is listener:
+                    conn, _ = listener.accept()
+                    conn.settimeout(SEND_TIMEOUT)
+                    self.buffers[conn] = bytearray()
+                    self.selector.register(conn, selectors.EVENT_READ)
+                else:
+                    self.receive(key.fileobj)
+
+    def receive(self, conn):
+        try:
+            data = conn.recv(64 * 1024)
+        except OSError:
+            data = b""
+        if not data:
+            self.disconnect(conn)
+            return
+        buffer = self.buffers[conn]
+        buffer += data
+        while len(buffer) >= FRAME_HEADER.size:
+            (size,) = FRAME_HEADER.unpack_from(buffer)
+            if size > MAX_FRAME_BYTES:
+                self.disconnect(conn)
+                return
+            if len(buffer) < FRAME_HEADER.size + size:
+                return
+            frame = bytes(buffer[FRAME_HEADER.size:FRAME_HEADER.size + size])
+            del buffer[:FRAME_HEADER.size + size]
+            try:
+                request = json.loads(frame)
+            except ValueError:
+                self.respond(conn, {"ok": False, "error": "Malformed request"})
+                continue
+            if request.get("backend", self.backend) != self.backend:
+                self.respond(conn, {"ok": False, "error": WRONG_BACKEND})
+            elif request.get("op") == "capture":
+                self.pending.append((conn, request))
+            else:
+                # Reads see every capture received before them.
+                self.commit()
+                self.respond(conn, self.handle(request))
+
+    def respond(self, conn, response):
+        try:
+            send_frame(conn, response)
+        except OSError:
+            self.disconnect(conn)
+
+    def disconnect(self, conn):
+        if self.buffers.pop(conn, None) is not None:
+            self.selector.unregister(conn)
+            conn.close()
+
+    # --- Requests ---
+
+    @profiled("daemon.commit")
+    def commit(self):
+        """Saves every pending capture in one write and answers their clients."""
+        if not self.pending:
+            return
+        captures, self.pending = self.pending, []
+        try:
+            notes = self.store.add_many([request.get("content", "") for _, request in captures])
+            self.cache.notes_added(notes)
+        except (OSError, sqlite3.Error) as e:
+            for conn, _ in captures:
+                self.respond(conn, {"ok": False, "error": f"Could not save the note: {e}"})
+            return
+        for (conn, _), note in zip(captures, notes):
+            self.respond(conn, {"ok": True, "result": note["id"]})
+        try: self.store.maybe_compact()
+        except (OSError, ValueError): pass
+
+    def handle(self, request):
+        op = request.get("op")
+        handler = getattr(self, "op_" + str(op), None)
+        if handler is None:
+            return {"ok": False, "error": f"Unknown request: {op}"}
+        try:
+            with span("daemon." + op):
+                return {"ok": True, "result": handler(request)}
+        except Exception as e:
+            # A failed request must not take the daemon down with it.
+            return {"ok": False, "error": str(e) or type(e).__name__}
+
+    def op_list(self, request):
+        """Lists every note's id, timestamp and title, newest first."""
+        notes = self.cache.notes()[:request.get("limit")]
+        return [{"id": note.id, "timestamp": note.timestamp, "title": note.title} for note in notes]
+
+    def op_read(self, request):
+        self.cache.refresh()
+        note = self.cache.get(request.get("id"))
+        return note and note_dict(note)
+
+    def op_search(self, request):
+        """Finds notes by tag, newest first, or by text, best match first."""
+        if "text" in request:
+            if self.words is None:
+                return self.store.search_text(request["text"])
+            self.words.refresh()
+            keys = [key for key, _ in self.words.search(request["text"])]
+        else:
+            if self.tags is None:
+                return self.store.search_tag(request.get("tag", ""))
+            self.tags.refresh()
+            keys = self.tags.lookup(request.get("tag", ""))
+        self.cache.refresh()
+        notes = [self.cache.get(key) for key in keys]
+        notes = [note for note in notes if note is not None]
+        if "text" not in request:
+            notes.sort(key=lambda note: note.epoch, reverse=True)
+        return [note_dict(note) for note in notes]
+
+    def op_export(self, request):
+        from anno_app.anno_utils import export_notes
+        if not request.get("directory"):
+            raise ValueError("Export directory required.")
+        notes = [note_dict(note) for note in self.cache.notes()]
+        return self.with_output(export_notes, request["directory"], notes)
+
+    def op_backup(self, request):
+        from anno_app.anno_utils import backup_notes
+        return self.with_output(backup_notes, self.store)
+
+    def with_output(self, function, *args):
+        """Calls function and returns its result along with what it printed, for the client to show."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            result = function(*args)
+        return {"value": result, "output": output.getvalue()}
+
+def serve(backend=None):
+    """Runs the daemon in the foreground until it is interrupted or terminated."""
+    backend = backend or configured_backend()
+    probe = connect()
+    if probe is not None:
+        probe.close()
+        print(f"Error: An anno daemon is already listening on {SOCKET_PATH}.")
+        return False
+    daemon = AnnoDaemon(backend)
+
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    if os.path.exists(SOCKET_PATH):
+        # Left behind by a daemon that didn't shut down cleanly.
+        os.remove(SOCKET_PATH)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Only this user may connect.
+    old_umask = os.umask(0o077)
+    try:
+        listener.bind(SOCKET_PATH)
+    finally:
+        os.umask(old_umask)
+    listener.listen(LISTEN_BACKLOG)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Serving {len(daemon.cache.notes())} notes ({backend} backend) on {SOCKET_PATH}. Press Ctrl+C to stop.")
+    try:
+        daemon.serve_forever(listener)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.commit()
+        listener.close()
+        os.remove(SOCKET_PATH)
+    return True
@@ -0,0 +1,395 @@
+import os
+import re
+import json
+import math
+import weakref
+
+from anno_app.anno_store import file_identity, parse_note_content, normalize_tag, note_id
+from anno_app.anno_markup import tokenize
+from anno_app.anno_profile import span
+
+# --- Configuration ---
+# Bumped whenever the on-disk layout of an index changes, forcing a rebuild.
+INDEX_VERSION = 3
+
+# BM25 parameters: term frequency saturation and document length normalization.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# --- Helper Functions ---
+
+def note_tags(content):
+    """Returns the normalized, de-duplicated tags of a note."""
+    return sorted({normalize_tag(t) for t in parse_note_content(content)[1]})
+
+def note_words(content):
+    """Returns the indexed words of a note: its title followed by its body."""
+    title, _, body = parse_note_content(content)
+    return tokenize(title) + tokenize(body)
+
+def parse_query(query):
+    """Splits a search query into clauses that must all match.
+
+    Each clause is ("term", word), ("prefix", start) for words ending in '*',
+    or ("phrase", [words]) for quoted text.
+    """
+    clauses = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        if phrase:
+            words = tokenize(phrase)
+        elif word.endswith("*") and tokenize(word):
+            clauses.append(("prefix", tokenize(word)[-1]))
+            words = tokenize(word)[:-1]
+        else:
+            words = tokenize(word)
+        # Text like "e-mail" tokenizes to several words and is matched as a phrase.
+        if len(words) == 1:
+            clauses.append(("term", words[0]))
+        elif words:
+            clauses.append(("phrase", words))
+    return clauses
+
+def bm25(tf, df, doc_count, doc_length, average_length):
+    """Scores one term's contribution to a document with Okapi BM25."""
+    idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_length / (average_length or 1))
+    return idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+# --- Journal-Backed Indexes ---
+
+# The indexes alive in this process, so compaction can restamp the copies
+# held in memory (like the daemon's) along with the files.
+_live_indexes = weakref.WeakSet()
+
+class JournalIndex:
+    """Base class for sidecar indexes kept in step with a JournalStore.
+
+    An index is stamped with the identity of the snapshot file and the byte
+    offset it has read the journal up to. While the snapshot is unchanged, new
+    journal records (including ones appended by the shell capture) are folded
+    in from that offset, so keeping the index current costs O(changes). Any
+    other change to the files triggers a one-off rebuild.
+
+    Subclasses store the stamp with their data and implement _add/_remove.
+    """
+    # The profiling span that refreshing the index is recorded under.
+    span_name = "index"
+
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+        _live_indexes.add(self)
+
+    @classmethod
+    def open(cls, store):
+        """Loads the index for a store and brings it up to date."""
+        index = cls(store)
+        index.refresh()
+        return index
+
+    def _current_stamp(self, journal_offset):
+        journal = file_identity(self.store.journal_path)
+        return {"snapshot": file_identity(self.store.path), "journal": [journal[0], journal_offset]}
+
+    def _can_catch_up(self, stamp):
+        if stamp is None:
+            return False
+        if stamp["snapshot"] != file_identity(self.store.path):
+            return False
+        journal_ino, offset = stamp["journal"]
+        current_ino, _, current_size = file_identity(self.store.journal_path)
+        # A journal that didn't exist yet when the index was stamped can start anywhere.
+        if journal_ino and journal_ino != current_ino:
+            return False
+        return current_size >= offset
+
+    def refresh(self):
+        """Brings the index up to date with the store, as cheaply as possible."""
+        with span(self.span_name), self.store.shared_lock():
+            stamp = self._load()
+            if not self._can_catch_up(stamp):
+                self.rebuild()
+                return
+            offset = stamp["journal"][1]
+            records, end = self.store.read_journal(offset)
+            for record in records:
+                self._apply(record)
+            if end != offset or not stamp["journal"][0]:
+                self._save(self._current_stamp(end))
+
+    def restamp(self, old, new):
+        """Moves the index from stamp old to new if it was current at old.
+
+        Compaction rewrites the snapshot without changing any note, so an
+        index that had read the whole journal is still right afterwards; only
+        its stamp has to follow. Callers must hold the journal lock exclusively.
+        """
+        stamp = self._load()
+        if stamp is None or stamp["snapshot"] != old["snapshot"]:
+            return
+        journal_ino, offset = stamp["journal"]
+        if offset == old["journal"][1] and journal_ino in (0, old["journal"][0]):
+            self._save(new)
+
+    def rebuild(self):
+        """Re-indexes every note. Callers must hold the store's journal lock."""
+        self._clear()
+        for note in self.store._replay():
+            self._add(note["id"], note.get("content", ""))
+        self._save(self._current_stamp(self.store.read_journal()[1]))
+
+    def _apply(self, record):
+        """Applies one journal record, mirroring how JournalStore replays it."""
+        op, key = record.get("op"), note_id(record)
+        if op in ("add", "edit"):
+            self._remove(key)
+            self._add(key, record.get("content", ""))
+        elif op == "del":
+            self._remove(key)
+
+# --- SQLite-Backed Indexes ---
+
+class SqliteIndex(JournalIndex):
+    """Base class for indexes kept in a small SQLite file next to the JSON store.
+
+    Lookups only read the rows they ask for, and catching up only writes the
+    rows of the notes that changed, however large the corpus is. Subclasses
+    set the schema, which must include the meta table the stamp is kept in.
+    """
+    schema = ""
+
+    def __init__(self, store, path=None):
+        super().__init__(store, path or store.path + self.suffix)
+        # Imported here because the note cache builds on this module, and doesn't need it.
+        import sqlite3
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(self.schema)
+
+    def close(self):
+        _live_indexes.discard(self)
+        self.conn.close()
+
+    def _load(self):
+        meta = dict(self.conn.execute("SELECT name, value FROM meta"))
+        if meta.get("version") != str(INDEX_VERSION) or "stamp" not in meta:
+            return None
+        self._load_meta(meta)
+        return json.loads(meta["stamp"])
+
+    def _save(self, stamp):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", [
+                ("version", str(INDEX_VERSION)),
+                ("stamp", json.dumps(stamp)),
+            ] + self._meta())
+
+    def _load_meta(self, meta):
+        """Restores what a subclass keeps in the meta table besides the stamp."""
+
+    def _meta(self):
+        """Returns the (name, value) pairs a subclass keeps in the meta table besides the stamp."""
+        return []
+
+# --- Tag Index ---
+
+TAG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_by_key ON tags (key);
+"""
+
+# Where earlier versions kept the tag index, as one JSON file.
+LEGACY_TAG_SUFFIX = ".tags"
+
+class TagIndex(SqliteIndex):
+    """A persistent tag -> note id posting index kept next to the JSON store."""
+    span_name = "index.tags"
+    suffix = ".tagdb"
+    schema = TAG_SCHEMA
+
+    def lookup(self, tag):
+        """Returns the keys of the notes carrying a tag."""
+        rows = self.conn.execute("SELECT key FROM tags WHERE tag = ?", (normalize_tag(tag),))
+        return {key for (key,) in rows}
+
+    def _clear(self):
+        self.conn.execute("DELETE FROM tags")
+        # The JSON index of earlier versions is superseded by this one.
+        try:
+            os.remove(self.store.path + LEGACY_TAG_SUFFIX)
+        except FileNotFoundError:
+            pass
+
+    def _add(self, key, content):
+        self.conn.executemany("INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)",
+                              [(tag, key) for tag in note_tags(content)])
+
+    def _remove(self, key):
+        self.conn.execute("DELETE FROM tags WHERE key = ?", (key,))
+
+# --- Full-Text Index ---
+
+TEXT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS docs (key TEXT PRIMARY KEY, length INTEGER NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    key TEXT NOT NULL,
+    positions TEXT NOT NULL,
+    PRIMARY KEY (term, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_by_key ON postings (key);
+"""
+
+class TextIndex(SqliteIndex):
+    """A persistent word -> (note, positions) index for ranked full-text search.
+
+    Positions are kept to answer phrase queries.
+    """
+    span_name = "index.text"
+    suffix = ".words"
+    schema = TEXT_SCHEMA
+
+    def __init__(self, store, path=None):
+        super().__init__(store, path)
+        self.doc_count = 0
+        self.total_length = 0
+
+    # --- Persistence ---
+
+    def _load_meta(self, meta):
+        self.doc_count = int(meta["doc_count"])
+        self.total_length = int(meta["total_length"])
+
+    def _meta(self):
+        return [("doc_count", str(self.doc_count)), ("total_length", str(self.total_length))]
+
+    def _clear(self):
+        self.conn.execute("DELETE FROM docs")
+        self.conn.execute("DELETE FROM postings")
+        self.doc_count = 0
+        self.total_length = 0
+
+    def _add(self, key, content):
+        words = note_words(content)
+        positions = {}
+        for i, word in enumerate(words):
+            positions.setdefault(word, []).append(i)
+        self.conn.execute("INSERT OR REPLACE INTO docs (key, length) VALUES (?, ?)", (key, len(words)))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO postings (term, key, positions) VALUES (?, ?, ?)",
+            [(word, key, " ".join(map(str, pos))) for word, pos in positions.items()])
+        self.doc_count += 1
+        self.total_length += len(words)
+
+    def _remove(self, key):
+        row = self.conn.execute("SELECT length FROM docs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return
+        self.conn.execute("DELETE FROM docs WHERE key = ?", (key,))
+        self.conn.execute("DELETE FROM postings WHERE key = ?", (key,))
+        self.doc_count -= 1
+        self.total_length -= row[0]
+
+    # --- Querying ---
+
+    def _postings(self, term, prefix=False):
+        """Returns {term: {key: [positions]}} for a term or every term with a prefix."""
+        if prefix:
+            rows = self.conn.execute(
+                "SELECT term, key, positions FROM postings WHERE term >= ? AND term < ?",
+                (term, term + "\U0010ffff"))
+        else:
+            rows = self.conn.execute("SELECT term, key, positions FROM postings WHERE term = ?", (term,))
+        result = {}
+        for term, key, positions in rows:
+            result.setdefault(term, {})[key] = [int(p) for p in positions.split()]
+        return result
+
+    def _phrase_matches(self, words):
+        """Returns {key: occurrences} for the notes containing the words in order."""
+        lists = [self._postings(word).get(word, {}) for word in words]
+        keys = set(lists[0]).intersection(*lists[1:]) if lists else set()
+        matches = {}
+        for key in keys:
+            starts = set(lists[0][key])
+            for offset, postings in enumerate(lists[1:], 1):
+                starts &= {p - offset for p in postings[key]}
+            if starts:
+                matches[key] = len(starts)
+        return matches
+
+    def search(self, query, limit=None):
+        """Returns (key, score) pairs for the notes matching every clause, best first."""
+        clauses = parse_query(query)
+        if not clauses or not self.doc_count:
+            return []
+
+        # Each clause contributes one or more (key -> term frequency) maps.
+        clause_hits = []
+        for kind, value in clauses:
+            if kind == "phrase":
+                hits = [self._phrase_matches(value)]
+            else:
+                postings = self._postings(value, prefix=(kind == "prefix"))
+                hits = [{key: len(pos) for key, pos in by_key.items()} for by_key in postings.values()]
+            clause_hits.append(hits)
+
+        candidates = None
+        for hits in clause_hits:
+            keys = set().union(*hits)
+            candidates = keys if candidates is None else candidates & keys
+        if not candidates:
+            return []
+
+        lengths = {}
+        candidate_list = list(candidates)
+        for i in range(0, len(candidate_list), 500):
+            chunk = candidate_list[i:i + 500]
+            lengths.update(self.conn.execute(
+                f"SELECT key, length FROM docs WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+
+        average_length = self.total_length / self.doc_count
+        scores = dict.fromkeys(candidates, 0.0)
+        for hits in clause_hits:
+            for tf_by_key in hits:
+                df = len(tf_by_key)
+                for key in candidates.intersection(tf_by_key):
+                    scores[key] += bm25(tf_by_key[key], df, self.doc_count, lengths.get(key, 0), average_length)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit] if limit else ranked
+
+# --- Compaction ---
+
+def restamp_indexes(store, old, new):
+    """Restamps every index of a store that was current when it was compacted.
+
+    Called by JournalStore.replace_all with the journal lock still held, so
+    the next reader catches up from the new snapshot instead of rebuilding.
+    """
+    # Imported here because the cache module builds on this one.
+    from anno_app.anno_cache import open_cache
+    indexes = {index.path: index for index in list(_live_indexes) if index.store.path == store.path}
+    cache = open_cache(store)
+    indexes.setdefault(cache.path, cache)
+    opened = []
+    for kind in (TagIndex, TextIndex):
+        path = store.path + kind.suffix
+        if path not in indexes and os.path.exists(path):
+            indexes[path] = kind(store, path)
+            opened.append(indexes[path])
+    try:
+        for index in indexes.values():
+            try:
+                index.restamp(old, new)
+            except Exception:
+                # An index that can't be restamped is rebuilt by its next reader.
+                pass
+    finally:
+        for index in opened:
+            index.close()
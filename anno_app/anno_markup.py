@@ -0,0 +1,73 @@
+import re
+from functools import lru_cache
+
+# --- Markup Spans ---
+# The anno markup shared by the renderers and the search index:
+# <h>highlight</h>, <i>important</i> and <c>code</c> inline, plus line
+# prefixes for checklists ([x], [ ]) and lists (*, -, 1.). Every marker is
+# matched by one pattern: a line prefix followed by whitespace, or an
+# inline tag.
+MARKUP_RE = re.compile(
+    r"^[ \t]*(?:(?P<checklist_done>\[x\])|(?P<checklist_pending>\[ \])|(?P<list_bullet>[\*\-]|\d+\.)(?=\s|$))[ \t]*"
+    r"|<(?P<open>[hic])>|</(?P<close>[hic])>",
+    re.MULTILINE)
+INLINE_STYLES = {"h": "highlight", "i": "important", "c": "code"}
+LINE_STYLES = ("checklist_done", "checklist_pending", "list_bullet")
+# Parsed notes kept for re-rendering, e.g. when a note is opened again.
+MARKUP_CACHE_SIZE = 256
+WORD_RE = re.compile(r"\w+")
+
+def markup_spans(text):
+    """Parses a note's markup into spans, in one pass over the text.
+
+    Each span is a tuple (style, start, end, inner_start, inner_end) of
+    character offsets, sorted by start. For an inline tag, start..end covers
+    the tags and inner_start..inner_end the text between them; for a line,
+    start is its marker, inner_start the text after it and both ends the end
+    of the line. Like the old per-tag regexes, an inline tag closes at the
+    first matching closing tag, and different tags may nest or overlap.
+    """
+    spans, opened = [], {}
+    for match in MARKUP_RE.finditer(text):
+        style = match.lastgroup
+        if style == "open":
+            opened.setdefault(match.group("open"), match)
+        elif style == "close":
+            start = opened.pop(match.group("close"), None)
+            if start is not None:
+                spans.append((INLINE_STYLES[match.group("close")], start.start(), match.end(), start.end(), match.start()))
+        else:
+            end = text.find("\n", match.end())
+            if end < 0: end = len(text)
+            spans.append((style, match.start(style), end, match.end(), end))
+    spans.sort(key=lambda span: span[1])
+    return tuple(spans)
+
+# The renderers parse through this cache; the index reads every note once,
+# so it calls markup_spans directly and leaves the cache to them.
+parse_markup = lru_cache(maxsize=MARKUP_CACHE_SIZE)(markup_spans)
+
+# --- Indexed Text ---
+
+def strip_markup(text):
+    """Removes the markup markers from a note, leaving only the words it shows.
+
+    The markers are the ones markup_spans finds, so the index and the
+    renderers agree on what is markup: "3.14" is a number, not a list item.
+    """
+    markers = []
+    for style, start, end, inner_start, inner_end in markup_spans(text):
+        markers.append((start, inner_start))
+        if style not in LINE_STYLES: markers.append((inner_end, end))
+    # Each marker is its own match, so once sorted they never overlap.
+    markers.sort()
+    pieces, position = [], 0
+    for marker_start, marker_end in markers:
+        pieces.append(text[position:marker_start])
+        position = marker_end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+def tokenize(text):
+    """Splits the visible text of a note into lowercase words for indexing."""
+    return WORD_RE.findall(strip_markup(text).lower())
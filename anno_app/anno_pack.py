@@ -0,0 +1,190 @@
+import os
+import sys
+import mmap
+import struct
+
+from anno_app.anno_store import JournalStore, PACK_FILE, parse_note_content, note_id, fsync_directory
+from anno_app.anno_cache import Note, NoteCache, timestamp_epoch, epoch_timestamp
+from anno_app.anno_profile import profiled, span
+
+# --- Pack Format ---
+# A pack file keeps every note's content in a data region, followed by a
+# compact index that lists the notes without touching their content:
+#
+#   header    magic, version, note count and the offsets of the sections below
+#   data      each note's content, UTF-8 encoded, back to back
+#   entries   one fixed-size ENTRY per note, newest first
+#   tag ids   u32 indexes into the tag names, tag_count of them per note
+#   strings   titles, and timestamps not in the standard format (UTF-8)
+#   tags      the distinct tag names, one per line
+#
+# Offsets into the strings section count characters, so it is decoded once.
+PACK_MAGIC = b"ANNOPACK"
+PACK_VERSION = 1
+HEADER = struct.Struct("<8sII5Q")
+# id, epoch, content offset, content length, title start, title length,
+# timestamp start, timestamp length (0 for the standard format),
+# first tag id, tag count.
+ENTRY = struct.Struct("<8sqQIIIIIIH")
+
+def write_pack(path, notes):
+    """Writes notes (dicts with content, timestamp and id) to a pack file, atomically."""
+    notes = sorted(notes, key=lambda n: timestamp_epoch(n["timestamp"]), reverse=True)
+    entries, tag_ids, strings = [], [], []
+    tag_numbers = {}
+    string_length = 0
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(bytes(HEADER.size))
+        for note in notes:
+            text = note.get("content", "")
+            content = text.encode()
+            offset = f.tell()
+            f.write(content)
+
+            title, tags, _ = parse_note_content(text)
+            # An empty name would be lost when the tag names are split again.
+            tags = [tag for tag in tags if tag]
+            timestamp = note["timestamp"]
+            epoch = timestamp_epoch(timestamp)
+            odd_timestamp = "" if epoch_timestamp(epoch) == timestamp else timestamp
+            entries.append(ENTRY.pack(
+                bytes.fromhex(note_id(note)), epoch, offset, len(content),
+                string_length, len(title), string_length + len(title), len(odd_timestamp),
+                len(tag_ids), len(tags)))
+            strings += (title, odd_timestamp)
+            string_length += len(title) + len(odd_timestamp)
+            tag_ids += [tag_numbers.setdefault(tag, len(tag_numbers)) for tag in tags]
+
+        entries_offset = f.tell()
+        f.write(b"".join(entries))
+        tag_ids_offset = f.tell()
+        f.write(struct.pack(f"<{len(tag_ids)}I", *tag_ids))
+        strings_offset = f.tell()
+        f.write("".join(strings).encode())
+        tags_offset = f.tell()
+        f.write("\n".join(tag_numbers).encode())
+        end = f.tell()
+
+        f.seek(0)
+        f.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, len(entries),
+                            entries_offset, tag_ids_offset, strings_offset, tags_offset, end))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(path)
+
+class Pack:
+    """A read-only, memory-mapped pack file.
+
+    The mapping stays valid after compaction replaces the file, so notes
+    listed from it can still be opened.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.count, self.entries_offset, self.tag_ids_offset,
+         self.strings_offset, self.tags_offset, self.end) = HEADER.unpack_from(self.map)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"{path} is not a version {PACK_VERSION} anno pack")
+
+    def content(self, offset, length):
+        """Decodes one note's content, and nothing else."""
+        return self.map[offset:offset + length].decode()
+
+    def notes(self):
+        """Lists every note, newest first, reading only the index."""
+        strings = self.map[self.strings_offset:self.tags_offset].decode()
+        names = self.map[self.tags_offset:self.end].decode()
+        tag_ids = struct.unpack_from(f"<{(self.strings_offset - self.tag_ids_offset) // 4}I", self.map, self.tag_ids_offset)
+        # Keyed on the ids rather than the names: a pack written by an older
+        # version may hold a single tag whose name is empty.
+        tag_names = [sys.intern(name) for name in names.split("\n")] if tag_ids else []
+
+        notes = []
+        for (raw_id, epoch, offset, length, title_start, title_length,
+             timestamp_start, timestamp_length, first_tag, tag_count) in ENTRY.iter_unpack(
+                self.map[self.entries_offset:self.tag_ids_offset]):
+            note = PackedNote.__new__(PackedNote)
+            note.id = raw_id.hex()
+            note.epoch = epoch
+            note._timestamp = strings[timestamp_start:timestamp_start + timestamp_length] or None
+            note.tags = tuple(tag_names[i] for i in tag_ids[first_tag:first_tag + tag_count])
+            note._title = strings[title_start:title_start + title_length]
+            note._pack, note._offset, note._length = self, offset, length
+            notes.append(note)
+        return notes
+
+class PackedNote(Note):
+    """A Note whose content stays in the pack file until it is first used."""
+    __slots__ = ("_pack", "_offset", "_length", "_title")
+
+    @property
+    def content(self):
+        return self._pack.content(self._offset, self._length)
+
+    @property
+    def title(self):
+        return self._title
+
+    @property
+    def body(self):
+        return parse_note_content(self.content)[2]
+
+# --- Note Cache ---
+
+class PackCache(NoteCache):
+    """The parsed-note cache of a PackStore.
+
+    The pack's index already lists notes without decoding their content, so
+    a rebuild only maps the pack and replays the journal, and nothing is
+    written to disk.
+    """
+    def rebuild(self):
+        """Lists the pack's notes and applies the journal. Callers must hold the journal lock."""
+        pack = self.store.open_pack()
+        with span("parse.pack"):
+            self._set_records(pack.notes() if pack else [])
+        records, end = self.store.read_journal()
+        for record in records:
+            self._apply(record)
+        self._save(self._current_stamp(end))
+
+    def _load(self):
+        self._loaded = True
+        return self.stamp
+
+    def _save(self, stamp):
+        self.stamp = stamp
+
+# --- Pack Store ---
+
+class PackStore(JournalStore):
+    """Keeps the snapshot as a memory-mapped pack file instead of JSON.
+
+    Changes are journaled exactly as in the JSON store and compaction writes
+    a new pack. Listing notes only reads the pack's index, and a note's
+    content is decoded when it is opened, so even very large archives open
+    quickly and in little memory.
+    """
+    cache_type = PackCache
+
+    def __init__(self, path=PACK_FILE, journal_path=None):
+        super().__init__(path, journal_path)
+
+    def open_pack(self):
+        """Maps the current pack file, or returns None if there is none yet."""
+        return Pack(self.path) if os.path.exists(self.path) else None
+
+    @profiled("load.pack")
+    def _read_snapshot(self):
+        pack = self.open_pack()
+        if pack is None:
+            return []
+        # Oldest first, in capture order like the JSON snapshot.
+        return [{"content": n.content, "timestamp": n.timestamp, "id": n.id} for n in reversed(pack.notes())]
+
+    @profiled("save.pack")
+    def _write_snapshot(self, notes):
+        write_pack(self.path, notes)
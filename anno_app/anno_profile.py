@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+
+# --- Configuration ---
+# Profiling is off unless ANNO_PROFILE is set (the anno script's --profile
+# sets it). It is read once, when this module is first imported, so the
+# functions marked with @profiled are left exactly as they are otherwise.
+# ANNO_PROFILE_TRACE names a file to also write the spans to as Chrome
+# trace events, for chrome://tracing or Perfetto; setting it turns
+# profiling on as well.
+TRACE_FILE = os.environ.get("ANNO_PROFILE_TRACE") or None
+ENABLED = os.environ.get("ANNO_PROFILE", "") not in ("", "0") or TRACE_FILE is not None
+# Spans are timed from when this module was imported.
+START_NS = time.perf_counter_ns()
+
+if ENABLED:
+    # Imported only when profiling, so a normal start doesn't pay for them.
+    import json
+    import atexit
+    from _thread import get_ident as _get_ident
+    from functools import wraps
+
+# --- Spans ---
+
+class _NullSpan:
+    """What span() returns while profiling is off: a context manager that does nothing."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+# Finished spans: (name, start_ns, duration_ns, self_ns, thread id).
+spans = []
+# The spans open on each thread, innermost last.
+_open = {}
+
+class Span:
+    __slots__ = ("name", "start", "children", "thread")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.thread = _get_ident()
+        self.children = 0
+        _open.setdefault(self.thread, []).append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter_ns() - self.start
+        stack = _open[self.thread]
+        stack.pop()
+        # Time spent in nested spans is counted once, as theirs.
+        if stack: stack[-1].children += duration
+        spans.append((self.name, self.start, duration, duration - self.children, self.thread))
+        return False
+
+def span(name):
+    """Returns a context manager recording the time spent in its block under name."""
+    return Span(name) if ENABLED else NULL_SPAN
+
+def profiled(name):
+    """Decorates a function so every call is recorded as a span; a no-op unless profiling is on."""
+    if not ENABLED:
+        return lambda function: function
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# --- Reporting ---
+
+def summary():
+    """Returns a table of the recorded spans by total time: count, total, self time and slowest call."""
+    totals = {}
+    for name, _, duration, self_time, _ in spans:
+        entry = totals.setdefault(name, [0, 0, 0, 0])
+        entry[0] += 1
+        entry[1] += duration
+        entry[2] += self_time
+        entry[3] = max(entry[3], duration)
+    width = max([len(name) for name in totals] + [len("span")])
+    lines = [f"anno profile: {(time.perf_counter_ns() - START_NS) / 1e6:.1f} ms since start",
+             f"  {'span':<{width}} {'calls':>7} {'total ms':>10} {'self ms':>10} {'max ms':>10}"]
+    for name, (count, total, self_time, longest) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        lines.append(f"  {name:<{width}} {count:>7} {total / 1e6:>10.2f} {self_time / 1e6:>10.2f} {longest / 1e6:>10.2f}")
+    return "\n".join(lines)
+
+def write_trace(path):
+    """Writes the recorded spans as Chrome trace events ("X" events, in microseconds)."""
+    pid = os.getpid()
+    events = [{"name": name, "cat": name.split(".", 1)[0], "ph": "X", "pid": pid, "tid": thread,
+               "ts": (start - START_NS) / 1000, "dur": duration / 1000}
+              for name, start, duration, _, thread in spans]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+def report():
+    """Prints the summary to stderr, keeping stdout clean for piped output, and writes the trace."""
+    print(summary(), file=sys.stderr)
+    if TRACE_FILE:
+        try:
+            write_trace(TRACE_FILE)
+            print(f"anno profile: trace written to {TRACE_FILE}", file=sys.stderr)
+        except OSError as e:
+            print(f"anno profile: could not write the trace: {e}", file=sys.stderr)
+
+if ENABLED:
+    atexit.register(report)
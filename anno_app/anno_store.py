@@ -0,0 +1,701 @@
+import os
+import re
+import json
+import time
+import fcntl
+from contextlib import contextmanager
+
+from anno_app.anno_profile import profiled
+
+# --- Configuration ---
+# The compacted snapshot of all notes, kept as a plain JSON array so older
+# versions of anno (and tools like jq) can still read it.
+ANNOTATIONS_FILE = os.path.expanduser("~/.local/share/annotations.json")
+# Every capture, edit and delete is appended here as a single JSON line.
+JOURNAL_FILE = ANNOTATIONS_FILE + ".journal"
+# The optional SQLite database, with tag and full-text indexes.
+DATABASE_FILE = os.path.expanduser("~/.local/share/annotations.db")
+# The optional pack file: an index of every note plus their memory-mapped content.
+PACK_FILE = os.path.expanduser("~/.local/share/annotations.pack")
+SETTINGS_FILE = os.path.expanduser("~/.config/anno/settings.json")
+
+# The storage backends anno can use. The active one comes from the ANNO_BACKEND
+# environment variable (set by 'anno --backend'), then settings.json.
+BACKENDS = ("json", "sqlite", "pack")
+DEFAULT_BACKEND = "json"
+
+# The journal is folded back into the snapshot once it grows past this size,
+# or past half the size of the snapshot, whichever is larger.
+COMPACT_MIN_BYTES = 1024 * 1024
+
+# --- Helper Functions ---
+
+def parse_note_content(content):
+    """Parses the raw text of a note to separate title, tags, and body."""
+    lines = content.split('\n', 2)
+    title = lines[0] if lines else "Untitled"
+    tags = []
+    body_start_index = 1
+    
+    # Tags are expected on the second line in the format: [#tag1, #tag2]
+    if len(lines) > 1:
+        tags_match = re.match(r'^\s*\[(.*)\]\s*$', lines[1])
+        if tags_match:
+            tags_str = tags_match.group(1)
+            # A bare '#' names no tag, so it is dropped like an empty entry.
+            tags = [tag for tag in (t.strip().lstrip('#') for t in tags_str.split(',')) if tag]
+            body_start_index = 2
+            
+    body = '\n'.join(lines[body_start_index:]) if len(lines) > body_start_index else ''
+    return title, tags, body
+
+def new_note_id():
+    """Returns a fresh note id: 16 random hex digits."""
+    # What secrets.token_hex(8) returns, without importing it on the capture path.
+    return os.urandom(8).hex()
+
+def legacy_note_id(timestamp):
+    """Returns the id of a note captured before notes had ids.
+
+    It is derived from the timestamp, so every process (and every journal
+    record written by an older anno) agrees on it, migrated or not.
+    """
+    import hashlib
+    return hashlib.sha1(timestamp.encode()).hexdigest()[:16]
+
+def note_id(note):
+    """Returns the id of a note or journal record."""
+    return note.get("id") or legacy_note_id(note.get("timestamp", ""))
+
+def distinct_note_id(key, taken):
+    """Returns key, or if another note already has it, an id derived from it that is free.
+
+    Notes from before ids existed that share a timestamp would otherwise
+    share an id. The derived ids depend only on the order the notes are
+    read in, so every process reading the same store agrees on them.
+    """
+    candidate, occurrence = key, 1
+    while candidate in taken:
+        occurrence += 1
+        candidate = legacy_note_id(f"{key}#{occurrence}")
+    return candidate
+
+def normalize_tag(tag):
+    """Returns the form of a tag used for comparisons, so '#Work' matches 'work'."""
+    tag = tag.strip().lower()
+    return tag[1:] if tag.startswith('#') else tag
+
+def now_timestamp():
+    """Returns the current UTC time, formatted the way notes store it."""
+    # Formatted with the time module, which unlike datetime is built in and
+    # costs the capture nothing to import.
+    seconds, microseconds = divmod(time.time_ns() // 1000, 1000000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{microseconds:06d}Z"
+
+def fsync_directory(path):
+    """Flushes the directory entry of path, so a file just renamed into place survives a crash."""
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def file_identity(path):
+    """Returns [inode, mtime_ns, size] for a file, or zeros if it is missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return [0, 0, 0]
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+# --- Journal Store ---
+
+class JournalStore:
+    """Stores notes as a JSON snapshot plus an append-only journal of changes.
+
+    Captures, edits and deletes only append one record to the journal, so
+    their cost no longer depends on how many notes exist. Reading replays the
+    journal on top of the snapshot, and compact() folds it back in.
+    """
+    def __init__(self, path=ANNOTATIONS_FILE, journal_path=None):
+        self.path = path
+        self.journal_path = journal_path or path + ".journal"
+        # Set when replaying found notes sharing an id and gave them distinct ones.
+        self.ids_repaired = False
+
+    def exists(self):
+        return os.path.exists(self.path) or os.path.exists(self.journal_path)
+
+    @contextmanager
+    def shared_lock(self):
+        """Holds the journal lock in shared mode, so compaction can't run mid-read."""
+        if not os.path.exists(self.journal_path):
+            yield
+            return
+        with open(self.journal_path, "rb") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            yield
+
+    # --- Reading ---
+
+    @profiled("load.snapshot")
+    def _read_snapshot(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    @profiled("load.journal")
+    def read_journal(self, offset=0):
+        """Returns the journal records after a byte offset, and the offset they end at.
+
+        A torn final line left by a crash is skipped, and the returned offset
+        stops before it.
+        """
+        records = []
+        if not os.path.exists(self.journal_path):
+            return records, 0
+        with open(self.journal_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records, offset
+
+    def generation(self):
+        """Returns a token that changes whenever the stored notes may have changed."""
+        return {"snapshot": file_identity(self.path), "journal": file_identity(self.journal_path)}
+
+    def load(self, newest_first=False):
+        """Returns every live note, in capture order, with the journal applied."""
+        with self.shared_lock():
+            notes = self._replay()
+        if self.ids_repaired:
+            # Writes the repaired ids, so they stay put from now on.
+            try: self.compact()
+            except OSError: pass
+        if newest_first:
+            notes.sort(key=lambda x: x["timestamp"], reverse=True)
+        return notes
+
+    def _replay(self):
+        """Applies the journal to the snapshot. Callers must hold the journal lock.
+
+        Every returned note has a unique id; notes from before ids existed
+        get theirs here, and keep it once compaction writes the snapshot.
+        """
+        notes = self._read_snapshot()
+        positions = {}
+        for i, note in enumerate(notes):
+            key = distinct_note_id(note_id(note), positions)
+            # Two notes with one id: the later one's new id has to be written.
+            if key != note_id(note): self.ids_repaired = True
+            note["id"] = key
+            positions[key] = i
+
+        # Replaying is idempotent, so a journal that survived a crash during
+        # compaction can safely be applied again on top of the new snapshot.
+        for record in self.read_journal()[0]:
+            op, key = record.get("op"), note_id(record)
+            i = positions.get(key)
+            if op == "add":
+                note = {"content": record.get("content", ""), "timestamp": record.get("timestamp"), "id": key}
+                if i is None:
+                    positions[key] = len(notes)
+                    notes.append(note)
+                else:
+                    notes[i] = note
+            elif op == "edit" and i is not None:
+                notes[i] = {**notes[i], "content": record.get("content", "")}
+            elif op == "del" and i is not None:
+                notes[i] = None
+                del positions[key]
+        return [n for n in notes if n is not None]
+
+    def tag_keys(self, tag):
+        """Returns the ids of the notes carrying the given tag."""
+        # Imported here because the index module builds on this one.
+        from anno_app.anno_index import TagIndex
+        index = TagIndex.open(self)
+        try:
+            return index.lookup(tag)
+        finally:
+            index.close()
+
+    def cached_notes(self, keys, newest_first=False):
+        """Returns the notes with the given ids, in order, from the parsed-note cache.
+
+        Looking them up by id there costs far less than replaying the store,
+        which is what the daemon does too.
+        """
+        # Imported here because the cache module builds on this one.
+        from anno_app.anno_cache import open_cache
+        cache = open_cache(self)
+        cache.refresh()
+        notes = [note for note in map(cache.get, keys) if note is not None]
+        if newest_first:
+            notes.sort(key=lambda note: note.epoch, reverse=True)
+        return [{"content": n.content, "timestamp": n.timestamp, "id": n.id} for n in notes]
+
+    @profiled("search.tag")
+    def search_tag(self, tag):
+        """Returns the notes carrying the given tag, newest first."""
+        keys = self.tag_keys(tag)
+        if not keys:
+            return []
+        return self.cached_notes(keys, newest_first=True)
+
+    def text_keys(self, query):
+        """Returns the ids of the notes matching a full-text query, best match first."""
+        from anno_app.anno_index import TextIndex
+        index = TextIndex.open(self)
+        try:
+            return [key for key, _ in index.search(query)]
+        finally:
+            index.close()
+
+    @profiled("search.text")
+    def search_text(self, query):
+        """Returns the notes matching a full-text query, best match first."""
+        keys = self.text_keys(query)
+        if not keys:
+            return []
+        return self.cached_notes(keys)
+
+    # --- Writing ---
+
+    def _append(self, *records, generation=None):
+        """Appends records to the journal and returns whether it did.
+
+        With a generation (see generation()), the records are only written if
+        the store is still at it, checked under the same lock as the write.
+        """
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        with open(self.journal_path, "a") as f:
+            # The lock keeps appends from interleaving with a running compaction.
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if generation is not None and not self._unchanged_since(generation):
+                return False
+            f.write(lines)
+            f.flush()
+        return True
+
+    def _unchanged_since(self, generation):
+        """Whether the files are still at generation. Callers must hold the journal lock."""
+        current = self.generation()
+        if generation["journal"][0] == 0 and current["journal"][2] == 0:
+            # There was no journal then; opening it to append just created it empty.
+            current["journal"] = generation["journal"]
+        return current == generation
+
+    def add(self, content, timestamp=None):
+        """Appends a new note and returns it."""
+        note = {"content": content, "timestamp": timestamp or now_timestamp(), "id": new_note_id()}
+        self._append({"op": "add", **note})
+        return note
+
+    def add_many(self, contents):
+        """Appends several new notes with a single journal write and returns them."""
+        notes = [{"content": content, "timestamp": now_timestamp(), "id": new_note_id()} for content in contents]
+        self._append(*({"op": "add", **note} for note in notes))
+        return notes
+
+    def update(self, key, content, generation=None):
+        """Records a new version of the content of the note with the given id.
+
+        With a generation, the edit is only recorded if nothing changed the
+        store since; returns whether it was recorded.
+        """
+        return self._append({"op": "edit", "id": key, "content": content}, generation=generation)
+
+    def delete(self, key):
+        """Records a tombstone for the note with the given id."""
+        self._append({"op": "del", "id": key})
+
+    # --- Compaction ---
+
+    def needs_compaction(self):
+        if self.ids_repaired:
+            return True
+        journal_size = _file_size(self.journal_path)
+        return journal_size > max(COMPACT_MIN_BYTES, _file_size(self.path) // 2)
+
+    @profiled("save.snapshot")
+    def _write_snapshot(self, notes):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(notes, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        fsync_directory(self.path)
+
+    def compact(self):
+        """Rewrites the snapshot with the journal applied and empties the journal."""
+        return self.replace_all(None)
+
+    def replace_all(self, notes):
+        """Replaces every stored note with the given ones, emptying the journal.
+
+        Passing None keeps the current notes, which is how compact() works.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.journal_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if notes is None:
+                notes = self._replay()
+                journal = os.fstat(lock.fileno())
+                old = {"snapshot": file_identity(self.path), "journal": [journal.st_ino, journal.st_size]}
+                self._write_snapshot(notes)
+                # Truncating last means a crash before this point only leaves
+                # records that replay to the same result.
+                lock.truncate(0)
+                # Imported here because the index module builds on this one.
+                from anno_app.anno_index import restamp_indexes
+                restamp_indexes(self, old, {"snapshot": file_identity(self.path), "journal": [journal.st_ino, 0]})
+            else:
+                # The journal holds changes to the notes being replaced and must
+                # never be replayed onto the new ones, so it is emptied first.
+                # (Restores back those changes up just before.)
+                lock.truncate(0)
+                os.fsync(lock.fileno())
+                self._write_snapshot(notes)
+        self.ids_repaired = False
+        return len(notes)
+
+    def maybe_compact(self):
+        """Compacts the store if the journal has grown large enough to matter."""
+        if self.needs_compaction():
+            return self.compact()
+        return None
+
+# --- SQLite Store ---
+# sqlite3 and the markup parser are imported by the methods that use them,
+# so capturing into the JSON store doesn't pay for loading them.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    uid TEXT
+);
+CREATE INDEX IF NOT EXISTS notes_by_timestamp ON notes (timestamp);
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS note_tags (
+    note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+    tag_id INTEGER NOT NULL REFERENCES tags (id),
+    PRIMARY KEY (tag_id, note_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS note_tags_by_note ON note_tags (note_id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5 (title, body, tokenize = 'unicode61');
+"""
+
+# Stored in PRAGMA user_version; bumped when the indexed form of a note changes.
+SCHEMA_VERSION = 2
+
+class SqliteStore:
+    """Stores notes in an SQLite database with tag and full-text indexes.
+
+    Listing, lookups and tag searches become indexed queries, so they don't
+    have to decode every note in the corpus the way the JSON file does.
+    """
+    def __init__(self, path=DATABASE_FILE):
+        self.path = path
+        self._conn = None
+        self.has_fts = False
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    @property
+    def conn(self):
+        import sqlite3
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            self._conn.executescript(SCHEMA)
+            try:
+                self._conn.executescript(FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                # Some SQLite builds ship without FTS5; tag search still works.
+                self.has_fts = False
+            self._add_uids()
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._reindex()
+        return self._conn
+
+    def _add_uids(self):
+        """Gives databases made before notes had ids a uid column, filled in from the timestamps."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(notes)")}
+        with self._conn:
+            if "uid" not in columns:
+                self._conn.execute("ALTER TABLE notes ADD COLUMN uid TEXT")
+            missing = self._conn.execute("SELECT id, timestamp FROM notes WHERE uid IS NULL ORDER BY id").fetchall()
+            taken = {uid for (uid,) in self._conn.execute("SELECT uid FROM notes WHERE uid IS NOT NULL")}
+            updates = []
+            for rowid, timestamp in missing:
+                uid = distinct_note_id(legacy_note_id(timestamp), taken)
+                taken.add(uid)
+                updates.append((uid, rowid))
+            self._conn.executemany("UPDATE notes SET uid = ? WHERE id = ?", updates)
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS notes_by_uid ON notes (uid)")
+
+    def _reindex(self):
+        """Rebuilds the tag and full-text indexes from the stored notes."""
+        with self._conn:
+            self._conn.execute("DELETE FROM note_tags")
+            if self.has_fts:
+                self._conn.execute("DELETE FROM notes_fts")
+            for note_id, content in self._conn.execute("SELECT id, content FROM notes").fetchall():
+                self._index_note(note_id, content)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def generation(self):
+        """Returns a token that changes whenever the stored notes may have changed."""
+        # Every committed transaction rewrites pages of the database file.
+        return {"database": file_identity(self.path)}
+
+    # --- Reading ---
+
+    @profiled("load.sqlite")
+    def load(self, newest_first=False):
+        """Returns every note, in capture order or newest first."""
+        order = "DESC" if newest_first else "ASC"
+        rows = self.conn.execute(f"SELECT content, timestamp, uid FROM notes ORDER BY timestamp {order}, id {order}")
+        return [_row_note(row) for row in rows]
+
+    def tag_keys(self, tag):
+        """Returns the ids of the notes carrying the given tag."""
+        rows = self.conn.execute(
+            "SELECT n.uid FROM tags t"
+            " JOIN note_tags nt ON nt.tag_id = t.id"
+            " JOIN notes n ON n.id = nt.note_id"
+            " WHERE t.name = ?",
+            (normalize_tag(tag),))
+        return {uid for (uid,) in rows}
+
+    @profiled("search.tag")
+    def search_tag(self, tag):
+        """Returns the notes carrying the given tag, newest first."""
+        rows = self.conn.execute(
+            "SELECT n.content, n.timestamp, n.uid FROM tags t"
+            " JOIN note_tags nt ON nt.tag_id = t.id"
+            " JOIN notes n ON n.id = nt.note_id"
+            " WHERE t.name = ? ORDER BY n.timestamp DESC",
+            (normalize_tag(tag),))
+        return [_row_note(row) for row in rows]
+
+    def text_keys(self, query):
+        """Returns the ids of the notes matching a full-text query, best match first."""
+        return [n["id"] for n in self.search_text(query)]
+
+    @profiled("search.text")
+    def search_text(self, query):
+        """Returns the notes matching a full-text query, best match first."""
+        import sqlite3
+        conn = self.conn # Connecting is what detects FTS5 support
+        if not self.has_fts:
+            raise sqlite3.OperationalError("full-text search needs an SQLite build with FTS5")
+        from anno_app.anno_index import parse_query
+        # Quote every clause so user input can't be read as FTS5 operators.
+        match = []
+        for kind, value in parse_query(query):
+            if kind == "phrase":
+                match.append('"' + " ".join(value) + '"')
+            else:
+                match.append(f'"{value}"' + ("*" if kind == "prefix" else ""))
+        if not match:
+            return []
+        # Title matches count twice as much as body matches.
+        rows = conn.execute(
+            "SELECT n.content, n.timestamp, n.uid FROM notes_fts"
+            " JOIN notes n ON n.id = notes_fts.rowid"
+            " WHERE notes_fts MATCH ? ORDER BY bm25(notes_fts, 2.0, 1.0)",
+            (" ".join(match),))
+        return [_row_note(row) for row in rows]
+
+    # --- Writing ---
+
+    def _index_note(self, note_id, content):
+        """Writes the tag and full-text index entries for one note."""
+        from anno_app.anno_markup import strip_markup
+        title, tags, body = parse_note_content(content)
+        for name in {normalize_tag(t) for t in tags}:
+            self.conn.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (name,))
+            self.conn.execute(
+                "INSERT OR IGNORE INTO note_tags (note_id, tag_id) SELECT ?, id FROM tags WHERE name = ?",
+                (note_id, name))
+        if self.has_fts:
+            # Index what the renderers show, without the <h>/<i>/<c> markers.
+            self.conn.execute(
+                "INSERT INTO notes_fts (rowid, title, body) VALUES (?, ?, ?)",
+                (note_id, strip_markup(title), strip_markup(body)))
+        return title
+
+    def _unindex_note(self, note_id):
+        self.conn.execute("DELETE FROM note_tags WHERE note_id = ?", (note_id,))
+        if self.has_fts:
+            self.conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (note_id,))
+
+    def _insert(self, content, timestamp, key):
+        cur = self.conn.execute(
+            "INSERT INTO notes (timestamp, title, content, uid) VALUES (?, ?, ?, ?)",
+            (timestamp, parse_note_content(content)[0], content, key))
+        self._index_note(cur.lastrowid, content)
+
+    def add(self, content, timestamp=None):
+        """Inserts a new note and returns it."""
+        note = {"content": content, "timestamp": timestamp or now_timestamp(), "id": new_note_id()}
+        with self.conn:
+            self._insert(note["content"], note["timestamp"], note["id"])
+        return note
+
+    def add_many(self, contents):
+        """Inserts several new notes in a single transaction and returns them."""
+        notes = [{"content": content, "timestamp": now_timestamp(), "id": new_note_id()} for content in contents]
+        with self.conn:
+            for note in notes:
+                self._insert(note["content"], note["timestamp"], note["id"])
+        return notes
+
+    def update(self, key, content, generation=None):
+        """Replaces the content of the note with the given id.
+
+        With a generation, the note is only replaced if nothing changed the
+        store since; returns whether that check passed.
+        """
+        with self.conn:
+            if generation is not None:
+                # Takes the write lock first, so nobody can commit between the check and the write.
+                self.conn.execute("BEGIN IMMEDIATE")
+                if self.generation() != generation:
+                    return False
+            row = self.conn.execute("SELECT id FROM notes WHERE uid = ?", (key,)).fetchone()
+            if row is None:
+                return True
+            self._unindex_note(row[0])
+            title = self._index_note(row[0], content)
+            self.conn.execute("UPDATE notes SET title = ?, content = ? WHERE id = ?", (title, content, row[0]))
+        return True
+
+    def delete(self, key):
+        """Removes the note with the given id."""
+        with self.conn:
+            for (rowid,) in self.conn.execute("SELECT id FROM notes WHERE uid = ?", (key,)).fetchall():
+                self._unindex_note(rowid)
+                self.conn.execute("DELETE FROM notes WHERE id = ?", (rowid,))
+
+    def replace_all(self, notes):
+        """Replaces every stored note with the given ones in a single transaction."""
+        with self.conn:
+            self.conn.execute("DELETE FROM note_tags")
+            self.conn.execute("DELETE FROM tags")
+            self.conn.execute("DELETE FROM notes")
+            if self.has_fts:
+                self.conn.execute("DELETE FROM notes_fts")
+            for note in notes:
+                self._insert(note.get("content", ""), note["timestamp"], note_id(note))
+        return len(notes)
+
+    # --- Maintenance ---
+
+    def compact(self):
+        """Merges the full-text index segments and reclaims free pages."""
+        if self.has_fts:
+            with self.conn:
+                self.conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('optimize')")
+        self.conn.execute("VACUUM")
+        return self.conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def maybe_compact(self):
+        """SQLite keeps itself tidy; explicit compaction is only done on request."""
+        return None
+
+def _row_note(row):
+    content, timestamp, key = row
+    return {"content": content, "timestamp": timestamp, "id": key}
+
+# --- Backend Selection ---
+
+def configured_backend():
+    """Returns the name of the storage backend anno should use."""
+    backend = os.environ.get("ANNO_BACKEND")
+    if not backend and os.path.exists(SETTINGS_FILE):
+        try:
+            with open(SETTINGS_FILE, "r") as f:
+                backend = json.load(f).get("backend")
+        except (json.JSONDecodeError, IOError):
+            backend = None
+    return backend if backend in BACKENDS else DEFAULT_BACKEND
+
+def open_store(backend=None):
+    """Returns the note store used by all of anno's front-ends."""
+    backend = backend or configured_backend()
+    if backend == "sqlite":
+        return SqliteStore()
+    if backend == "pack":
+        # Imported here because the pack store builds on this module.
+        from anno_app.anno_pack import PackStore
+        return PackStore()
+    return JournalStore()
+
+def migrate_store(target):
+    """Copies every note from the active backend into another and makes it the default.
+
+    The source files are left untouched, so switching back is always possible.
+    """
+    if target not in BACKENDS:
+        print(f"Error: Unknown backend '{target}'. Choose one of: {', '.join(BACKENDS)}.")
+        return False
+    source = configured_backend()
+    if source == target:
+        print(f"Notes are already stored with the '{target}' backend.")
+        return False
+    source_store = open_store(source)
+    if not source_store.exists():
+        print(f"Error: No notes found for the '{source}' backend.")
+        return False
+
+    count = open_store(target).replace_all(source_store.load())
+
+    settings = {}
+    if os.path.exists(SETTINGS_FILE):
+        try:
+            with open(SETTINGS_FILE, "r") as f:
+                settings = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            settings = {}
+    settings["backend"] = target
+    os.makedirs(os.path.dirname(SETTINGS_FILE), exist_ok=True)
+    with open(SETTINGS_FILE, "w") as f:
+        json.dump(settings, f, indent=2)
+
+    print(f"Migrated {count} notes from the '{source}' backend to '{target}'.")
+    return True
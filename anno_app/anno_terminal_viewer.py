@@ -1,13 +1,13 @@
 import json
 import os
 import sys
-import argparse
 from datetime import datetime
 import re
 
-# --- Configuration ---
-# The primary data file for the application.
-ANNOTATIONS_FILE = os.path.expanduser("~/.local/share/annotations.json")
+from anno_app.anno_store import open_store, parse_note_content
+from anno_app.anno_markup import parse_markup
+from anno_app.anno_client import daemon_request
+from anno_app.anno_profile import profiled
 
 # --- ANSI Color Codes for Terminal Styling ---
 # Provides a simple way to add color and emphasis to terminal output.
@@ -23,101 +23,188 @@ class Colors:
 
 # --- Note Parsing and Styling ---
 
-def parse_note_content(content):
-    """Parses the raw text of a note to separate title, tags, and body."""
-    lines = content.split('\n', 2)
-    title = lines[0] if lines else "Untitled"
-    tags = []
-    body_start_index = 1
-    
-    # Tags are expected on the second line in the format: [#tag1, #tag2]
-    if len(lines) > 1:
-        tags_match = re.match(r'^\s*\[(.*)\]\s*$', lines[1])
-        if tags_match:
-            tags_str = tags_match.group(1)
-            tags = [tag.strip().lstrip('#') for tag in tags_str.split(',') if tag.strip()]
-            body_start_index = 2
-            
-    body = '\n'.join(lines[body_start_index:]) if len(lines) > body_start_index else ''
-    return title, tags, body
+# How each markup style is shown, and the symbol replacing each line marker.
+TERMINAL_STYLES = {
+    "highlight": Colors.BG_YELLOW + Colors.BLACK,
+    "important": Colors.BOLD + Colors.RED,
+    "code": Colors.BOLD + Colors.CYAN,
+    "checklist_done": Colors.GREEN,
+    "checklist_pending": Colors.RED,
+    "list_bullet": Colors.YELLOW,
+}
+LINE_MARKERS = {"checklist_done": "✔ ", "checklist_pending": "☐ ", "list_bullet": "• "}
 
+@profiled("render.styling")
 def apply_terminal_styling(text):
     """Applies ANSI escape codes to the note body for terminal display."""
-    # Use functions for substitution to handle special characters and add clarity.
-    def replace_checklist_done(m): return f"{Colors.GREEN}✔ {m.group(1).lstrip()}{Colors.RESET}"
-    def replace_checklist_pending(m): return f"{Colors.RED}☐ {m.group(1).lstrip()}{Colors.RESET}"
-    def replace_list(m): return f"{Colors.YELLOW}• {m.group(1).lstrip()}{Colors.RESET}"
-
-    # Apply styling for checklists and lists.
-    text = re.sub(r'^\s*\[x\](.*)$' , replace_checklist_done, text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\[ \](.*)$' , replace_checklist_pending, text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*[\*\-](.*)$'   , replace_list, text, flags=re.MULTILINE)
-    text = re.sub(r'^(\s*\d+\.)\s*(.*)$' , replace_list, text, flags=re.MULTILINE)
-    
-    # Apply styling for custom inline tags like <h>, <i>, and <c>.
-    text = re.sub(r"<h>(.*?)</h>", f"{Colors.BG_YELLOW}{Colors.BLACK}\1{Colors.RESET}", text, flags=re.DOTALL)
-    text = re.sub(r"<i>(.*?)</i>", f"{Colors.BOLD}{Colors.RED}\1{Colors.RESET}", text, flags=re.DOTALL)
-    text = re.sub(r"<c>(.*?)</c>", f"{Colors.BOLD}{Colors.CYAN}\1{Colors.RESET}", text, flags=re.DOTALL)
-    return text
+    # Each span starts a style where it opens and ends it where it closes;
+    # the markers themselves are dropped or swapped for a symbol.
+    events = []
+    for span in parse_markup(text):
+        style, start, end, inner_start, inner_end = span
+        events.append((start, True, inner_start, span))
+        events.append((inner_end, False, end, span))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    output, active, position = [], [], 0
+    for at, opening, skip_to, span in events:
+        output.append(text[position:at])
+        style, start, inner_start = span[0], span[1], span[3]
+        if opening:
+            active.append(span)
+            marker = LINE_MARKERS.get(style, "")
+            # Numbered items keep their number.
+            if style == "list_bullet" and text[start].isdigit(): marker = text[start:inner_start].rstrip() + " "
+            output.append(TERMINAL_STYLES[style] + marker)
+        else:
+            # Ending one style resets them all, so restore the ones still open.
+            active.remove(span)
+            output.append(Colors.RESET + "".join(TERMINAL_STYLES[s[0]] for s in active))
+        position = skip_to
+    output.append(text[position:])
+    return "".join(output)
 
 # --- Core Application Logic ---
 
 def eprint(*args, **kwargs):
-    """Prints to stderr to avoid interfering with stdout for inter-process communication."""
+    """Prints to stderr, keeping stdout free for the output of other programs."""
     print(*args, file=sys.stderr, **kwargs)
 
+def note_cache(store):
+    """Opens the parsed-note cache of store."""
+    # Imported here, so only the commands that read the cache pay for
+    # loading it.
+    from anno_app.anno_cache import open_cache
+    return open_cache(store)
+
+@profiled("load.notes")
 def get_all_notes():
-    """Loads all notes from the JSON file and sorts them by timestamp."""
-    if not os.path.exists(ANNOTATIONS_FILE):
-        eprint(f"{Colors.RED}No annotations file found at {ANNOTATIONS_FILE}{Colors.RESET}")
+    """Returns every note, parsed and sorted reverse-chronologically.
+
+    Notes come from the parsed-note cache, so calling this again in the same
+    session only costs a few stat calls unless the store has changed.
+    """
+    store = open_store()
+    if not store.exists():
+        eprint(f"{Colors.RED}No annotations file found at {store.path}{Colors.RESET}")
         return []
     try:
-        with open(ANNOTATIONS_FILE, "r") as f:
-            notes = json.load(f)
-            # Sort notes reverse-chronologically.
-            notes.sort(key=lambda x: x["timestamp"], reverse=True)
-            return notes
+        return note_cache(store).notes()
     except json.JSONDecodeError:
         eprint(f"{Colors.RED}Error: Could not read or parse the annotations file.{Colors.RESET}")
         return []
 
+@profiled("render.search_results")
+def display_search_results(matches, description):
+    """Prints every matching note in full, under a header naming the search."""
+    if not matches:
+        eprint(f"{Colors.YELLOW}No notes found with the {description}.{Colors.RESET}")
+        return
+    eprint(f"{Colors.BOLD}{Colors.GREEN}--- Search Results for {description} ---{Colors.RESET}\n")
+    for note_data in matches:
+        title, tags, body = parse_note_content(note_data.get('content', ''))
+        dt = datetime.fromisoformat(note_data["timestamp"])
+        formatted_date = dt.strftime("%Y-%m-%d %I:%M %p")
+        eprint(f"{Colors.CYAN}{formatted_date}{Colors.RESET} - {Colors.BOLD}{title}{Colors.RESET}")
+        if tags:
+            eprint(f"{Colors.YELLOW}Tags: {json.dumps(tags)}{Colors.RESET}")
+        eprint(apply_terminal_styling(body) + "\n---")
+
+def daemon_results(op, **args):
+    """Asks a running daemon for a result; returns (True, result) or (False, None) if there is none.
+
+    Errors the daemon reports are printed and give a result of None.
+    """
+    response = daemon_request(op, **args)
+    if response is None:
+        return False, None
+    if not response["ok"]:
+        eprint(f"{Colors.RED}Error: {response['error']}{Colors.RESET}")
+        return True, None
+    return True, response["result"]
+
 def search_and_display_notes(search_term):
     """Filters and displays notes that match a given search tag."""
-    all_notes = get_all_notes()
-    if not all_notes: return
-
     if search_term.startswith('#'): search_term = search_term[1:]
     search_term = search_term.lower()
 
-    found_notes = False
-    for note_data in all_notes:
-        title, tags, body = parse_note_content(note_data.get('content', ''))
-        if any(search_term == tag.lower() for tag in tags):
-            if not found_notes:
-                eprint(f"{Colors.BOLD}{Colors.GREEN}--- Search Results for tag: '{search_term}' ---{Colors.RESET}\n")
-                found_notes = True
-            dt = datetime.fromisoformat(note_data["timestamp"])
-            formatted_date = dt.strftime("%Y-%m-%d %I:%M %p")
-            eprint(f"{Colors.CYAN}{formatted_date}{Colors.RESET} - {Colors.BOLD}{title}{Colors.RESET}")
-            if tags:
-                eprint(f"{Colors.YELLOW}Tags: {json.dumps(tags)}{Colors.RESET}")
-            eprint(apply_terminal_styling(body) + "\n---")
-    
-    if not found_notes: eprint(f"{Colors.YELLOW}No notes found with the tag '{search_term}'.{Colors.RESET}")
-
-def read_note(index):
-    """Displays the full, formatted content of a single note."""
-    all_notes = get_all_notes()
-    if not 1 <= index + 1 <= len(all_notes):
-        eprint(f"{Colors.RED}Invalid note number.{Colors.RESET}")
+    served, matches = daemon_results("search", tag=search_term)
+    if served:
+        if matches is not None: display_search_results(matches, f"tag '{search_term}'")
+        return
+
+    store = open_store()
+    if not store.exists():
+        eprint(f"{Colors.RED}No annotations file found at {store.path}{Colors.RESET}")
+        return
+
+    try:
+        matches = store.search_tag(search_term)
+    except json.JSONDecodeError:
+        eprint(f"{Colors.RED}Error: Could not read or parse the annotations file.{Colors.RESET}")
+        return
+
+    display_search_results(matches, f"tag '{search_term}'")
+
+def search_text_and_display_notes(query):
+    """Displays the notes matching a full-text query, best match first."""
+    served, matches = daemon_results("search", text=query)
+    if served:
+        if matches is not None: display_search_results(matches, f"text '{query}'")
         return
-    
-    note_data = all_notes[index]
-    title, tags, body = parse_note_content(note_data.get('content', ''))
-    dt = datetime.fromisoformat(note_data["timestamp"])
-    formatted_date = dt.strftime("%Y-%m-%d %I:%M %p")
 
-    eprint(f"\n{Colors.BOLD}{Colors.GREEN}--- Viewing Note #{index + 1} ---{Colors.RESET}")
+    store = open_store()
+    if not store.exists():
+        eprint(f"{Colors.RED}No annotations file found at {store.path}{Colors.RESET}")
+        return
+
+    import sqlite3
+    try:
+        matches = store.search_text(query)
+    except (json.JSONDecodeError, sqlite3.Error) as e:
+        eprint(f"{Colors.RED}Error: Could not search the notes: {e}{Colors.RESET}")
+        return
+
+    display_search_results(matches, f"text '{query}'")
+
+def list_notes():
+    """Prints every note's id, date and title to stdout, newest first, for scripts."""
+    served, notes = daemon_results("list")
+    if not served:
+        notes = [{"id": n.id, "timestamp": n.timestamp, "title": n.title} for n in get_all_notes()]
+    try:
+        for note in notes or []:
+            print(f"{note['id']}  {note['timestamp']}  {note['title']}")
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader (like `head`) stopped early; that is not an error.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return notes is not None
+
+def print_note(key):
+    """Prints the raw content of the note with the given id to stdout."""
+    served, note = daemon_results("read", id=key)
+    if not served:
+        get_all_notes()
+        note = note_cache(open_store()).get(key)
+        note = note and {"content": note.content}
+    if note is None:
+        eprint(f"{Colors.RED}No note with id {key}.{Colors.RESET}")
+        return False
+    print(note["content"])
+    return True
+
+def format_list_entry(number, note):
+    """Formats one line of the note list shown by the interactive view."""
+    formatted_date = note.datetime.strftime("%Y-%m-%d %I:%M %p")
+    return f"{Colors.YELLOW}{number}:{Colors.RESET} {Colors.CYAN}{formatted_date}{Colors.RESET} - {note.title}"
+
+def read_note(note_data, number):
+    """Displays the full, formatted content of a single note."""
+    title, tags, body = note_data.title, note_data.tags, note_data.body
+    formatted_date = note_data.datetime.strftime("%Y-%m-%d %I:%M %p")
+
+    eprint(f"\n{Colors.BOLD}{Colors.GREEN}--- Viewing Note #{number} ---{Colors.RESET}")
     eprint(f"{Colors.CYAN}{formatted_date}{Colors.RESET} - {Colors.BOLD}{title}{Colors.RESET}")
     if tags:
         eprint(f"{Colors.YELLOW}Tags: {json.dumps(tags)}{Colors.RESET}")
@@ -125,22 +212,59 @@ def read_note(index):
     eprint(apply_terminal_styling(body))
     eprint(f"\n{Colors.BOLD}{Colors.GREEN}--- End of Note ---{Colors.RESET}")
 
+def edit_in_editor(content):
+    """Opens content in the user's $EDITOR and returns the saved text."""
+    # Imported here because only editing needs them, and they are slow to load.
+    import shlex
+    import tempfile
+    import subprocess
+    fd, path = tempfile.mkstemp(prefix="anno_", suffix=".txt")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        # $EDITOR may carry its own arguments, just like in the shell script.
+        subprocess.call(shlex.split(os.environ.get("EDITOR") or "nano") + [path])
+        with open(path, "r") as f:
+            return f.read().rstrip("\n")
+    finally:
+        os.remove(path)
+
+def edit_note(store, note_data):
+    """Edits a note in place and returns its updated record, or None if unchanged."""
+    new_content = edit_in_editor(note_data.content)
+    if new_content == note_data.content:
+        eprint(f"{Colors.YELLOW}No changes made.{Colors.RESET}")
+        return None
+    store.update(note_data.id, new_content)
+    eprint(f"{Colors.GREEN}Note updated.{Colors.RESET}")
+    return note_cache(store).note_changed(note_data.id, new_content)
+
+@profiled("render.list")
+def print_note_list(notes):
+    """Prints the numbered list of notes, skipping ones deleted this session."""
+    eprint(f"{Colors.BOLD}{Colors.GREEN}--- Your Annotations ---{Colors.RESET}\n")
+    for i, note in enumerate(notes):
+        if note is not None:
+            eprint(format_list_entry(i + 1, note))
+
 def interactive_view():
-    """The main interactive loop for viewing, editing, and deleting notes."""
-    all_notes = get_all_notes()
+    """The main interactive loop for viewing, editing, and deleting notes.
+
+    Edits and deletes are applied to the store from this process, so a whole
+    session costs one startup no matter how many notes are changed.
+    """
+    store = open_store()
+    # A private copy: note numbers stay stable for the whole session, and
+    # deleted notes leave a gap instead of renumbering everything after them.
+    all_notes = list(get_all_notes())
     if not all_notes:
         eprint(f"{Colors.YELLOW}No annotations yet. Use 'anno' to create one.{Colors.RESET}")
         return
 
-    eprint(f"{Colors.BOLD}{Colors.GREEN}--- Your Annotations ---{Colors.RESET}\n")
-    for i, note in enumerate(all_notes):
-        title, _, _ = parse_note_content(note.get('content',''))
-        dt = datetime.fromisoformat(note["timestamp"])
-        formatted_date = dt.strftime("%Y-%m-%d %I:%M %p")
-        eprint(f"{Colors.YELLOW}{i + 1}:{Colors.RESET} {Colors.CYAN}{formatted_date}{Colors.RESET} - {title}")
+    print_note_list(all_notes)
 
     while True:
-        eprint(f"\n{Colors.BOLD}Commands: Enter number to READ || Enter number + e to EDIT || Enter num. + d to DELETE || Type /quit to QUIT.{Colors.RESET}")
+        eprint(f"\n{Colors.BOLD}Commands: Enter number to READ || Enter number + e to EDIT || Enter num. + d to DELETE || Type /list to LIST || Type /quit to QUIT.{Colors.RESET}")
         try:
             eprint("Enter command: ", end="")
             choice = input().lower().strip()
@@ -149,6 +273,9 @@ def interactive_view():
             break
 
         if choice == 'quit' or choice == '/quit': break
+        if choice == 'list' or choice == '/list':
+            print_note_list(all_notes)
+            continue
 
         # Use regex to parse the user's command (e.g., '1d' for delete, '2e' for edit, '3' for read)
         action, num_str = (None, None)
@@ -166,15 +293,23 @@ def interactive_view():
         if action and num_str:
             try:
                 num = int(num_str)
-                if 1 <= num <= len(all_notes):
+                if 1 <= num <= len(all_notes) and all_notes[num - 1] is not None:
+                    note_data = all_notes[num - 1]
                     if action == "READ":
-                        read_note(num - 1)
-                        continue # Go back to the command prompt
-                    else:
-                        # For Edit/Delete, send the command to the parent shell script.
-                        # This is the primary method of inter-process communication.
-                        print(f"ACTION:{action}:{num - 1}")
-                        sys.exit(0)
+                        read_note(note_data, num)
+                    elif action == "EDIT":
+                        updated = edit_note(store, note_data)
+                        if updated is not None:
+                            # Only the edited entry changes; show its new list line.
+                            all_notes[num - 1] = updated
+                            eprint(format_list_entry(num, updated))
+                    elif action == "DELETE":
+                        store.delete(note_data.id)
+                        note_cache(store).note_changed(note_data.id)
+                        all_notes[num - 1] = None
+                        eprint(f"{Colors.GREEN}Note deleted.{Colors.RESET}")
+                elif 1 <= num <= len(all_notes):
+                    eprint(f"{Colors.RED}Note {num} was deleted.{Colors.RESET}")
                 else:
                     eprint(f"{Colors.RED}Invalid note number: {num}{Colors.RESET}")
             except ValueError:
@@ -182,15 +317,34 @@ def interactive_view():
         else:
             eprint(f"{Colors.RED}Invalid command. Please try again.{Colors.RESET}")
 
+    # Leaving the viewer is a quiet moment to fold the journal back in.
+    try: store.maybe_compact()
+    except (OSError, ValueError): pass
+
 # --- Script Entry Point ---
+# The options are read by hand: argparse takes longer to import than most of
+# these commands take to run.
+USAGE = """usage: anno_terminal_viewer.py [-s TAG | --text QUERY | --list | --read ID]
+
+  -s, --search TAG  Search for notes by a specific tag.
+  --text QUERY      Search titles and bodies. Use "quotes" for phrases and word* for prefixes.
+  --list            Print the id, date and title of every note.
+  --read ID         Print the content of the note with this id."""
+
 if __name__ == "__main__":
-    # Set up command-line argument parsing.
-    parser = argparse.ArgumentParser(description="Terminal viewer for Anno notes.")
-    parser.add_argument("-s", "--search", help="Search for notes by a specific tag.")
-    args = parser.parse_args()
+    args = sys.argv[1:]
 
     # Launch the appropriate view based on arguments.
-    if args.search:
-        search_and_display_notes(args.search)
+    if not args:
+        interactive_view()
+    elif args == ["--list"]:
+        sys.exit(0 if list_notes() else 1)
+    elif len(args) == 2 and args[0] == "--read":
+        sys.exit(0 if print_note(args[1]) else 1)
+    elif len(args) == 2 and args[0] == "--text":
+        search_text_and_display_notes(args[1])
+    elif len(args) == 2 and args[0] in ("-s", "--search"):
+        search_and_display_notes(args[1])
     else:
-        interactive_view()
\ No newline at end of file
+        eprint(USAGE)
+        sys.exit(0 if args[0] in ("-h", "--help") else 2)
\ No newline at end of file
@@ -1,15 +1,35 @@
 import os
 import json
 import re
-import zipfile
+import fcntl
+import shutil
+import hashlib
 from datetime import datetime
 
+from anno_app.anno_store import ANNOTATIONS_FILE, DATABASE_FILE, PACK_FILE, open_store, fsync_directory
+from anno_app.anno_backup import BackupRepository, blob_hash
+from anno_app.anno_profile import profiled, span
+
 # --- Configuration ---
-# Define the primary locations for annotations and configuration files.
+# Define the primary locations for configuration files and backups.
 # These are placed in standard user directories for Linux systems.
-ANNOTATIONS_FILE = os.path.expanduser("~/.local/share/annotations.json")
 CONFIG_DIR = os.path.expanduser("~/.config/anno")
 BACKUP_DIR = os.path.join(CONFIG_DIR, "backups")
+# Pruning keeps this many of the newest backups, plus the newest backup of
+# each of this many days.
+BACKUP_KEEP_LAST = 24
+BACKUP_KEEP_DAILY = 30
+# A backup comparison lists at most this many notes of each kind.
+DIFF_LIST_LIMIT = 20
+# Restores stream a backup's notes file out of its zip in blocks of this size.
+RESTORE_COPY_BYTES = 1024 * 1024
+# Every export directory keeps a manifest of the notes exported into it.
+EXPORT_MANIFEST = ".anno_export.json"
+EXPORT_MANIFEST_VERSION = 1
+# Exported files are written by this many threads at once, once there are
+# at least EXPORT_THREADED_JOBS files to write or remove.
+EXPORT_WORKERS = 8
+EXPORT_THREADED_JOBS = 64
 
 # --- Helper Functions ---
 
@@ -30,95 +50,421 @@ def sanitize_filename(name):
 
 # --- Core Data Management Functions ---
 
-def export_notes(target_dir):
-    """Exports all notes to individual .txt files in a specified directory."""
-    if not os.path.exists(ANNOTATIONS_FILE):
-        print("Error: Annotations file not found.")
-        return False
+def export_filename(note):
+    """Returns the descriptive file name a note is exported under."""
+    dt = datetime.fromisoformat(note["timestamp"])
+    title = sanitize_filename(parse_note_content(note.get("content", "")))
+    return f"{dt.strftime('%Y-%m-%d_%H-%M-%S')}_{title}.txt"
+
+def load_export_manifest(target_dir):
+    """Returns the manifest of a previous export to target_dir, mapping note ids to their files."""
+    try:
+        with open(os.path.join(target_dir, EXPORT_MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == EXPORT_MANIFEST_VERSION:
+            return manifest["notes"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return {}
+
+def write_export_file(path, content):
+    """Writes one exported note, replacing the old file in a single step."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f_out:
+        f_out.write(content)
+    os.replace(tmp_path, path)
+
+def run_export_jobs(jobs):
+    """Runs (key, function, *args) jobs and returns (key, OSError) for each that failed.
+
+    Large batches are spread over EXPORT_WORKERS threads; small ones, like
+    most incremental exports, run here rather than pay for starting them.
+    """
+    if len(jobs) < EXPORT_THREADED_JOBS:
+        failures = []
+        for key, function, *args in jobs:
+            try:
+                function(*args)
+            except OSError as e:
+                failures.append((key, e))
+        return failures
+    # Imported here because it is slow to load and small exports don't use it.
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=EXPORT_WORKERS) as pool:
+        futures = [(key, pool.submit(function, *args)) for key, function, *args in jobs]
+        failures = []
+        for key, future in futures:
+            try:
+                future.result()
+            except OSError as e:
+                failures.append((key, e))
+        return failures
+
+@profiled("export")
+def export_notes(target_dir, notes=None):
+    """Exports all notes to individual .txt files in a specified directory.
+
+    A manifest in the directory remembers which file holds which note and a
+    hash of its content, so exporting again only writes new and changed
+    notes and removes the files of deleted ones. Callers already holding
+    every note (like the daemon) can pass them in.
+    """
+    if notes is None:
+        store = open_store()
+        if not store.exists():
+            print("Error: Annotations file not found.")
+            return False
+        try:
+            notes = store.load()
+        except json.JSONDecodeError:
+            print("Error: Could not read or parse the annotations file.")
+            return False
 
     os.makedirs(target_dir, exist_ok=True)
-    
+
+    previous = load_export_manifest(target_dir)
+    present = set(os.listdir(target_dir))
+    manifest, writes = {}, []
+    # Notes keep the file they were exported to before, so names stay stable
+    # between runs; a new or renamed note whose name is already taken gets
+    # its id appended.
+    used = {entry["file"] for entry in previous.values()}
+    for note in notes:
+        key, content = note["id"], note.get("content", "")
+        digest = hashlib.sha1(content.encode()).hexdigest()
+        entry = previous.get(key)
+        if entry is not None and entry["hash"] == digest and entry["file"] in present:
+            manifest[key] = entry
+            continue
+        filename = export_filename(note)
+        if entry is None or entry["file"] != filename:
+            if filename in used:
+                filename = f"{filename[:-4]}_{key}.txt"
+            used.add(filename)
+        manifest[key] = {"hash": digest, "file": filename}
+        writes.append((key, filename, content))
+
+    # Files of deleted notes, and old names of renamed ones.
+    kept = {entry["file"] for entry in manifest.values()}
+    removed = [entry["file"] for key, entry in previous.items() if entry["file"] not in kept]
+
+    jobs = [(key, write_export_file, os.path.join(target_dir, filename), content)
+            for key, filename, content in writes]
+    jobs += [(None, os.remove, os.path.join(target_dir, filename))
+             for filename in removed if filename in present]
+    failed = False
+    with span("export.write"):
+        failures = run_export_jobs(jobs)
+    for key, error in failures:
+        print(f"Error exporting to {target_dir}: {error}")
+        failed = True
+        # Without its file the note counts as not exported, so the next run retries it.
+        if key is not None: manifest.pop(key, None)
+
     try:
-        with open(ANNOTATIONS_FILE, "r") as f:
-            notes = json.load(f)
-    except json.JSONDecodeError:
-        print("Error: Could not read or parse the annotations file.")
+        write_export_file(os.path.join(target_dir, EXPORT_MANIFEST), json.dumps(
+            {"version": EXPORT_MANIFEST_VERSION, "notes": manifest}))
+    except OSError as e:
+        print(f"Error writing the export manifest: {e}")
+        return False
+    if failed:
         return False
 
-    count = 0
-    for note in notes:
-        content = note.get("content", "")
-        timestamp_str = note.get("timestamp")
-        dt = datetime.fromisoformat(timestamp_str)
-        
-        title = parse_note_content(content)
-        sanitized_title = sanitize_filename(title)
-        
-        # Create a unique, descriptive filename for each note.
-        filename = f"{dt.strftime('%Y-%m-%d_%H-%M-%S')}_{sanitized_title}.txt"
-        filepath = os.path.join(target_dir, filename)
-        
-        with open(filepath, "w") as f_out:
-            f_out.write(content)
-        count += 1
-
-    print(f"Successfully exported {count} notes to {target_dir}")
+    print(f"Successfully exported {len(notes)} notes to {target_dir} "
+          f"({len(writes)} written, {len(notes) - len(writes)} unchanged, {len(removed)} removed)")
     return True
 
-def backup_notes():
-    """Creates a timestamped .zip backup of the annotations.json file."""
-    if not os.path.exists(ANNOTATIONS_FILE):
+@profiled("backup")
+def backup_notes(store=None, reuse_unchanged=False):
+    """Backs up the notes of a store (the active one by default) and returns the backup's name.
+
+    Backups go into a deduplicating repository, so only notes that changed
+    since an earlier backup take up any new space. With reuse_unchanged, an
+    existing backup of exactly these notes is returned instead of a new one.
+    """
+    store = store or open_store()
+    if not store.exists():
         print("Error: Annotations file not found. Nothing to back up.")
         return None
 
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-    
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    backup_filename = f"anno_backup_{timestamp}.zip"
-    backup_filepath = os.path.join(BACKUP_DIR, backup_filename)
-    
     try:
-        # Use a zip archive to save space and keep the backup self-contained.
-        with zipfile.ZipFile(backup_filepath, 'w', zipfile.ZIP_DEFLATED) as zf:
-            zf.write(ANNOTATIONS_FILE, os.path.basename(ANNOTATIONS_FILE))
-        print(f"Successfully created backup: {backup_filepath}")
-        return backup_filepath
+        notes = store.load()
+        repository = BackupRepository(BACKUP_DIR)
+        existing = set(repository.snapshots())
+        name = repository.write_snapshot(notes, reuse_unchanged)
+        if name in existing:
+            print(f"The notes are already backed up in {name}.")
+        else:
+            print(f"Successfully created backup: {name} ({len(notes)} notes)")
     except Exception as e:
         print(f"Error creating backup: {e}")
         return None
+    # With the notes safely backed up, a grown journal is folded back in.
+    try: store.maybe_compact()
+    except (OSError, ValueError): pass
+    return name
+
+def backup_before_restore(store):
+    """Makes sure the notes about to be replaced are backed up. Returns False if that failed."""
+    if not store.exists():
+        return True
+    print("Creating a pre-restore backup of the current notes...")
+    if backup_notes(store, reuse_unchanged=True) is None:
+        print("Error: Could not back up the current notes, so nothing was restored.")
+        return False
+    return True
 
 def list_backups():
-    """Returns a sorted list of available backup files, newest first."""
-    if not os.path.exists(BACKUP_DIR):
-        return []
-    
-    backups = [f for f in os.listdir(BACKUP_DIR) if f.endswith('.zip') and f.startswith('anno_backup_')]
+    """Returns a sorted list of available backups, newest first.
+
+    Besides the repository's snapshots this includes .zip backups made by
+    older versions, which can still be restored.
+    """
+    backups = BackupRepository(BACKUP_DIR).snapshots()
+    if os.path.exists(BACKUP_DIR):
+        backups += [f for f in os.listdir(BACKUP_DIR) if f.endswith('.zip') and f.startswith('anno_backup_')]
     return sorted(backups, reverse=True)
 
+def format_size(size):
+    """Formats a byte count for people, e.g. 1.5 MB."""
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def describe_backups(backups):
+    """Returns a one-line description of each backup, from the catalog alone."""
+    catalog = BackupRepository(BACKUP_DIR).catalog()
+    descriptions = []
+    for name in backups:
+        entry = catalog.get(name)
+        if name.endswith(".zip"):
+            # Only backups made by older versions need zipfile, which is slow to load.
+            import zipfile
+            try:
+                with zipfile.ZipFile(os.path.join(BACKUP_DIR, name)) as zf:
+                    size = sum(info.file_size for info in zf.infolist())
+                descriptions.append(f"{name}  (older .zip backup, {format_size(size)})")
+            except (OSError, zipfile.BadZipFile):
+                descriptions.append(f"{name}  (unreadable .zip backup)")
+        elif not entry:
+            descriptions.append(f"{name}  (unreadable)")
+        else:
+            # How much smaller the backup is than the notes, thanks to compression and deduplication.
+            ratio = f"{entry['size'] / entry['stored']:.1f}x" if entry["stored"] else "no new data"
+            newest = entry["newest"]
+            description = (f"{name}  {entry['count']} notes, {format_size(entry['size'])}, "
+                           f"{format_size(entry['stored'])} stored ({ratio})")
+            if newest: description += f", newest: {newest['title'][:40]} ({newest['timestamp'][:16].replace('T', ' ')})"
+            descriptions.append(description)
+    return descriptions
+
+@profiled("backup.diff")
+def diff_backup(backup_filename):
+    """Prints how a backup differs from the current notes, comparing per-note hashes.
+
+    Only the backup's note list is read, plus the notes that differ, so the
+    comparison costs little even for large backups.
+    """
+    repository = BackupRepository(BACKUP_DIR)
+    if backup_filename.endswith(".zip"):
+        print("Error: Older .zip backups can only be compared by restoring them.")
+        return False
+    store = open_store()
+    try:
+        backed_up = {key: (timestamp, digest) for key, timestamp, digest in repository.snapshot_entries(backup_filename)}
+        current = {note["id"]: note for note in store.load()} if store.exists() else {}
+    except Exception as e:
+        print(f"Error comparing with {backup_filename}: {e}")
+        return False
+
+    def backup_title(key):
+        return parse_note_content(repository.get_blob(backed_up[key][1]).decode())
+
+    added = [key for key in current if key not in backed_up]
+    removed = [key for key in backed_up if key not in current]
+    changed = [key for key in current if key in backed_up and
+               blob_hash(current[key].get("content", "").encode()) != backed_up[key][1]]
+
+    print(f"Comparing {backup_filename} with your current notes:")
+    print(f"  {len(removed)} deleted since the backup, {len(added)} added, {len(changed)} changed, "
+          f"{len(backed_up) - len(removed) - len(changed)} unchanged.")
+    for symbol, keys, title in (("-", removed, backup_title),
+                                ("+", added, lambda key: parse_note_content(current[key].get("content", ""))),
+                                ("~", changed, lambda key: f"{backup_title(key)} -> {parse_note_content(current[key].get('content', ''))}")):
+        for key in keys[:DIFF_LIST_LIMIT]:
+            print(f"  {symbol} {title(key)}")
+        if len(keys) > DIFF_LIST_LIMIT:
+            print(f"    ... and {len(keys) - DIFF_LIST_LIMIT} more")
+    return True
+
+def diff_backup_number(number):
+    """Runs diff_backup on a backup numbered as in the restore menu, newest first."""
+    backups = list_backups()
+    if not 1 <= number <= len(backups):
+        print("Invalid number.")
+        return False
+    return diff_backup(backups[number - 1])
+
+def prune_backups(keep_last=BACKUP_KEEP_LAST, keep_daily=BACKUP_KEEP_DAILY):
+    """Deletes old backups and the stored notes only they used.
+
+    Keeps the newest keep_last backups plus the newest one of each of the
+    last keep_daily days with a backup. Older .zip backups are left alone.
+    """
+    try:
+        snapshots, blobs = BackupRepository(BACKUP_DIR).prune(keep_last, keep_daily)
+    except Exception as e:
+        print(f"Error pruning backups: {e}")
+        return False
+    print(f"Removed {snapshots} old backups and {blobs} unused blobs.")
+    return True
+
+@profiled("restore")
 def restore_notes(backup_filename):
-    """Restores the annotations.json file from a specified backup zip file."""
+    """Restores the notes from a backup, replacing those of the active backend.
+
+    The backup is read and verified in full before anything is replaced,
+    and the current notes are backed up first. Older .zip backups restore
+    the notes file (JSON, SQLite or pack) they contain.
+    """
+    if backup_filename.endswith(".zip"):
+        return restore_zip_backup(backup_filename)
+    repository = BackupRepository(BACKUP_DIR)
+    if backup_filename not in repository.snapshots():
+        print(f"Error: Backup not found: {backup_filename}")
+        return False
+
+    try:
+        # Checks the snapshot's checksum and every note's hash while reading.
+        notes = repository.read_snapshot(backup_filename)
+    except Exception as e:
+        print(f"Error: Backup {backup_filename} failed verification: {e}")
+        return False
+
+    store = open_store()
+    if not backup_before_restore(store):
+        return False
+    try:
+        # Each store swaps its notes in atomically: a renamed, fsynced file or a transaction.
+        store.replace_all(notes)
+        print(f"Successfully restored {len(notes)} notes from {backup_filename}")
+        return True
+    except Exception as e:
+        print(f"Error restoring from backup: {e}")
+        return False
+
+def restore_menu():
+    """Lists the backups, asks which one to restore and restores it. Returns True once restored."""
+    backups = list_backups()
+    if not backups:
+        print("No backups found.")
+        return False
+    print("Available backups:\n")
+    for i, description in enumerate(describe_backups(backups)):
+        print(f"{i + 1}: {description}")
+    try:
+        choice = int(input("\nEnter number of backup to restore: "))
+    except (ValueError, EOFError, KeyboardInterrupt):
+        print("\nInvalid choice. Aborting.")
+        return False
+    if not 1 <= choice <= len(backups):
+        print("Invalid number.")
+        return False
+    return restore_notes(backups[choice - 1])
+
+# The backend whose notes file each kind of .zip backup holds.
+ZIP_BACKUP_BACKENDS = {ANNOTATIONS_FILE: "json", DATABASE_FILE: "sqlite", PACK_FILE: "pack"}
+
+def check_notes_file(path, target):
+    """Raises an exception unless path holds intact notes in the format of target."""
+    if target == DATABASE_FILE:
+        import sqlite3
+        conn = sqlite3.connect(path)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            conn.execute("SELECT content, timestamp FROM notes LIMIT 1").fetchall()
+        finally:
+            conn.close()
+        if result != "ok":
+            raise ValueError(f"database integrity check failed: {result}")
+    elif target == PACK_FILE:
+        # Imported here because the pack module builds on the store module.
+        from anno_app.anno_pack import Pack
+        pack = Pack(path)
+        for note in pack.notes():
+            if note._offset + note._length > pack.entries_offset:
+                raise ValueError("a note lies outside the pack's data")
+        pack.map.close()
+    else:
+        with open(path) as f:
+            notes = json.load(f)
+        if not isinstance(notes, list) or not all(
+                isinstance(note, dict) and isinstance(note.get("content", ""), str) and isinstance(note.get("timestamp"), str)
+                for note in notes):
+            raise ValueError("not a list of notes")
+
+def restore_zip_backup(backup_filename):
+    """Restores the notes file (JSON, SQLite or pack) from a .zip backup made by an older version.
+
+    The file is decompressed next to the one it replaces, checked (the zip's
+    CRC and the file's own structure), and only then renamed over it.
+    """
+    import sqlite3
+    import zipfile
     backup_filepath = os.path.join(BACKUP_DIR, backup_filename)
     if not os.path.exists(backup_filepath):
         print(f"Error: Backup file not found: {backup_filename}")
         return False
 
-    # As a safety measure, create one last backup of the current state before overwriting.
-    print("Creating a pre-restore backup of the current notes...")
-    backup_notes()
-
+    tmp_path = None
     try:
         with zipfile.ZipFile(backup_filepath, 'r') as zf:
-            # Extract the annotations file into its parent directory, overwriting the original.
-            zf.extract(os.path.basename(ANNOTATIONS_FILE), os.path.dirname(ANNOTATIONS_FILE))
-        
-        # Ensure the restored file has the correct name.
-        extracted_path = os.path.join(os.path.dirname(ANNOTATIONS_FILE), os.path.basename(ANNOTATIONS_FILE))
-        if os.path.exists(ANNOTATIONS_FILE):
-             os.remove(ANNOTATIONS_FILE)
-        os.rename(extracted_path, ANNOTATIONS_FILE)
+            # Backups hold whichever notes file their backend used.
+            for target in ZIP_BACKUP_BACKENDS:
+                if os.path.basename(target) in zf.namelist():
+                    break
+            else:
+                print(f"Error: {backup_filename} does not contain any notes.")
+                return False
+            # Stream it into a temporary file on the same filesystem, so the
+            # final rename is atomic. Reading to the end checks the CRC.
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = target + ".restore.tmp"
+            with zf.open(os.path.basename(target)) as src, open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, RESTORE_COPY_BYTES)
+                dst.flush()
+                os.fsync(dst.fileno())
+        check_notes_file(tmp_path, target)
+    except Exception as e:
+        print(f"Error: Backup {backup_filename} failed verification: {e}")
+        if tmp_path and os.path.exists(tmp_path): os.remove(tmp_path)
+        return False
 
+    if not backup_before_restore(open_store(ZIP_BACKUP_BACKENDS[target])):
+        os.remove(tmp_path)
+        return False
+    try:
+        if target == DATABASE_FILE:
+            # Opening the old database rolls back any transaction a crash left
+            # in its hot journal, which would otherwise be applied to the new one.
+            if os.path.exists(target):
+                conn = sqlite3.connect(target)
+                conn.execute("PRAGMA schema_version").fetchone()
+                conn.close()
+            os.replace(tmp_path, target)
+        else:
+            # The journal describes changes to the notes being replaced; empty
+            # it under its lock before the swap so it is never replayed onto them.
+            with open(target + ".journal", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                lock.truncate(0)
+                os.fsync(lock.fileno())
+                os.replace(tmp_path, target)
+        fsync_directory(target)
         print(f"Successfully restored notes from {backup_filename}")
         return True
     except Exception as e:
         print(f"Error restoring from backup: {e}")
-        return False
\ No newline at end of file
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        return False
@@ -9,19 +9,43 @@ if os.path.basename(os.getcwd()) == 'anno_app':
 import tkinter as tk
 from tkinter import ttk, font, messagebox, filedialog
 import json
+import queue
+import threading
 from datetime import datetime
+from bisect import bisect_right
 from collections import defaultdict
-import re
 
-# Import the utility functions for backup, export, etc.
-from anno_app.anno_utils import export_notes, backup_notes, list_backups, restore_notes
+from anno_app.anno_store import open_store, legacy_note_id
+from anno_app.anno_cache import open_cache, new_cache, share_cache
+from anno_app.anno_markup import parse_markup, INLINE_STYLES, LINE_STYLES
+from anno_app.anno_watch import StoreWatcher
+from anno_app.anno_profile import profiled
 
 # --- Configuration ---
 CONFIG_DIR = os.path.expanduser("~/.config/anno")
 SETTINGS_FILE = os.path.join(CONFIG_DIR, "settings.json")
-ANNOTATIONS_FILE = os.path.expanduser("~/.local/share/annotations.json")
 FONT_NAME = "DejaVu Sans"
 MONO_FONT_NAME = "DejaVu Sans Mono"
+# Notes are loaded on a worker thread and handed to the UI in batches of this
+# size, one batch per event loop turn, so the window stays responsive.
+LOAD_BATCH_SIZE = 500
+LOAD_POLL_MS = 20
+# Notes longer than this many characters are styled progressively: the
+# visible lines first, then the rest in batches of STYLE_BATCH_SPANS spans,
+# one batch per event loop turn.
+PROGRESSIVE_STYLING_CHARS = 50000
+STYLE_BATCH_SPANS = 2000
+# While editing with live preview on, the lines changed since the last
+# restyle are styled again once typing pauses for this long.
+LIVE_STYLE_DELAY_MS = 150
+# Notes written by other programs (a capture, the terminal viewer) are merged
+# in as they happen: the store's directory is watched with inotify where
+# available, or polled this often otherwise. Changes are picked up once
+# they have settled for RELOAD_DELAY_MS.
+RELOAD_POLL_MS = 1000
+RELOAD_DELAY_MS = 100
+# The text tags markup styling adds, as opposed to e.g. the selection.
+MARKUP_TAGS = (*INLINE_STYLES.values(), *LINE_STYLES, "hidden")
 
 # --- Themes ---
 # A collection of themes for the GUI, allowing user customization.
@@ -90,9 +114,40 @@ class AnnotationViewer(tk.Tk):
 
         self.settings = load_settings()
         self.current_theme = tk.StringVar(value=self.settings.get("theme", "Pastel"))
+        self.live_styling = tk.BooleanVar(value=self.settings.get("live_styling", True))
 
+        self.store = open_store()
+        # The note model: the cache's Note records, newest first for the tree.
+        # Notes are looked up by id in the cache's own index, so a save or
+        # delete only has to touch the one note it changed.
         self.all_notes = []
+        self.cache = None
         self.current_note_id = None
+        self.loading = False
+        self.load_generation = 0
+        # Bumped whenever the text area changes, to stop progressive styling.
+        self.style_generation = 0
+        self.load_total = 0
+
+        # Edit mode bookkeeping for the live preview: the range of lines
+        # changed since the last restyle, and the line count at that time.
+        self.editing = False
+        self.live_dirty_lines = None
+        self.live_line_count = 0
+        self.live_style_job = None
+
+        # Tree bookkeeping: the full year/month tree is kept (detached) while
+        # search results are shown, search_items is None while it is visible,
+        # and months hold their notes here until they are first opened.
+        self.full_tree_items = None
+        self.search_items = None
+        self.pending_months = {}
+
+        # Live reload: the store generation the model was last synced with.
+        self.watcher = None
+        self.reload_job = None
+        self.store_generation = None
+        self.editing_note = None
 
         self.setup_fonts_and_styles()
         self.create_widgets()
@@ -140,12 +195,23 @@ class AnnotationViewer(tk.Tk):
         tree_card.columnconfigure(0, weight=1)
         self.tree = ttk.Treeview(tree_card, show="tree", selectmode="browse", style="Card.Treeview")
         self.tree.grid(row=0, column=0, sticky="nsew")
+
+        # Shown below the tree while notes are still being loaded.
+        self.progress_frame = ttk.Frame(tree_card, style="Card.TFrame")
+        self.progress_frame.columnconfigure(0, weight=1)
+        self.progress_label = ttk.Label(self.progress_frame, text="Loading notes...", style="Card.TLabel")
+        self.progress_label.grid(row=0, column=0, sticky="w")
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode="determinate")
+        self.progress_bar.grid(row=1, column=0, sticky="ew", pady=(2, 0))
         
         search_card = ttk.Frame(left_pane, style="Card.TFrame", padding=10)
         search_card.grid(row=1, column=0, sticky="ew", pady=(10,0))
         search_card.columnconfigure(1, weight=1)
 
-        ttk.Label(search_card, text="Search Tag:", style="Card.TLabel").grid(row=0, column=0, sticky="w")
+        # The search box matches either tags or the full text of notes.
+        self.search_mode = tk.StringVar(value="Tag")
+        self.search_mode_menu = ttk.Combobox(search_card, textvariable=self.search_mode, values=["Tag", "Text"], width=5, state="readonly")
+        self.search_mode_menu.grid(row=0, column=0, sticky="w")
         self.search_var = tk.StringVar()
         self.search_entry = ttk.Entry(search_card, textvariable=self.search_var)
         self.search_entry.grid(row=0, column=1, sticky="ew", padx=(5,0))
@@ -154,7 +220,7 @@ class AnnotationViewer(tk.Tk):
         search_button_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5,0))
         search_button_frame.columnconfigure(0, weight=1)
         search_button_frame.columnconfigure(1, weight=1)
-        self.search_button = ttk.Button(search_button_frame, text="Search", command=self.search_by_tag)
+        self.search_button = ttk.Button(search_button_frame, text="Search", command=self.run_search)
         self.search_button.grid(row=0, column=0, sticky="ew")
         self.clear_button = ttk.Button(search_button_frame, text="Clear", command=self.clear_search)
         self.clear_button.grid(row=0, column=1, sticky="ew", padx=(5,0))
@@ -192,14 +258,21 @@ class AnnotationViewer(tk.Tk):
         self.text_area.grid(row=1, column=0, sticky="nsew")
         self.text_area.config(state=tk.DISABLED)
 
-        self.style_bar = ttk.Label(content_card, text="Use <h>highlight</h>, <i>important</i>, <c>code</c>, [ ] checklist, * list", anchor="center", style="Card.TLabel")
+        # The markup help and the live preview toggle are shown while editing.
+        self.style_frame = ttk.Frame(content_card, style="Card.TFrame")
+        self.style_bar = ttk.Label(self.style_frame, text="Use <h>highlight</h>, <i>important</i>, <c>code</c>, [ ] checklist, * list", anchor="center", style="Card.TLabel")
+        self.style_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.live_toggle = ttk.Checkbutton(self.style_frame, text="Live preview", variable=self.live_styling, command=self.on_live_styling_toggle, style="Card.TCheckbutton")
+        self.live_toggle.pack(side=tk.RIGHT)
         self.paned_window.add(content_card, weight=3)
 
         # --- Bindings ---
         self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+        self.tree.bind("<<TreeviewOpen>>", self.on_tree_open)
         self.tree.bind("<Double-1>", self.on_double_click)
         self.theme_menu.bind("<<ComboboxSelected>>", self.on_theme_change)
-        self.search_entry.bind("<Return>", self.search_by_tag)
+        self.search_entry.bind("<Return>", self.run_search)
+        self.text_area.bind("<<Modified>>", self.on_text_modified)
 
     def apply_theme(self, theme_name=None):
         """Applies the selected color theme to all relevant widgets."""
@@ -211,6 +284,8 @@ class AnnotationViewer(tk.Tk):
         self.style.configure("TPanedWindow", background=theme["bg"])
         self.style.configure("Card.TFrame", background=theme["card"])
         self.style.configure("Card.TLabel", background=theme["card"], foreground=theme["text_fg"])
+        self.style.configure("Card.TCheckbutton", background=theme["card"], foreground=theme["text_fg"])
+        self.style.map("Card.TCheckbutton", background=[("active", theme["card"])])
         self.style.configure("Card.Treeview", background=theme["card"], foreground=theme["text_fg"], fieldbackground=theme["card"], font=self.tree_font, borderwidth=0, rowheight=self.tree_font.metrics("linespace") + 8)
         self.style.map("Card.Treeview", background=[("selected", theme["select_bg"] )], foreground=[("selected", theme["select_fg"] )])
         self.text_area.configure(bg=theme["card"], fg=theme["text_fg"], insertbackground=theme["text_fg"])
@@ -225,97 +300,262 @@ class AnnotationViewer(tk.Tk):
         self.text_area.tag_configure("checklist_pending", foreground=theme["checklist_pending"], font=self.list_font)
         self.text_area.tag_configure("list_bullet", foreground=theme.get("text_fg", "#000000"), font=self.list_font)
 
-    def parse_note_content(self, content):
-        """Parses the raw text of a note to separate title, tags, and body."""
-        lines = content.split('\n', 2)
-        title = lines[0] if lines else "Untitled"
-        tags = []
-        body_start_index = 1
-        if len(lines) > 1:
-            tags_match = re.match(r'^\s*\[(.*)\]\s*$', lines[1])
-            if tags_match:
-                tags_str = tags_match.group(1)
-                tags = [tag.strip().lstrip('#') for tag in tags_str.split(',') if tag.strip()]
-                body_start_index = 2
-        body = '\n'.join(lines[body_start_index:]) if len(lines) > body_start_index else ''
-        return title, tags, body
-
     def load_annotations(self):
-        """Loads all notes from the JSON file and populates the UI."""
-        if not os.path.exists(ANNOTATIONS_FILE):
-            self.text_area.config(state=tk.NORMAL); self.text_area.insert("1.0", "No annotations file found."); self.text_area.config(state=tk.DISABLED)
-            return
-        with open(ANNOTATIONS_FILE, "r") as f:
-            try: self.raw_notes = json.load(f)
-            except json.JSONDecodeError: self.raw_notes = []
-        
+        """Starts loading all notes from the store in the background.
+
+        The window is usable right away: a worker thread reads the parsed
+        notes and the UI adds them to the tree batch by batch, newest first.
+        """
+        # Batches still queued for an earlier load are dropped.
+        self.load_generation += 1
         self.all_notes = []
-        for i, note_data in enumerate(self.raw_notes):
-            title, tags, body = self.parse_note_content(note_data.get('content', ''))
-            self.all_notes.append({
-                "id": i,
-                "timestamp": note_data["timestamp"],
-                "title": title,
-                "tags": tags,
-                "body": body,
-                "original_content": note_data["content"]
-            })
-
-        self.all_notes.sort(key=lambda x: x["timestamp"], reverse=True)
-        self.clear_search()
-        self.load_last_note()
-
-    def load_last_note(self):
-        """Selects the last opened note when the application starts."""
-        last_note_ts = self.settings.get("last_note")
-        if last_note_ts:
-            for note in self.all_notes:
-                if note["timestamp"] == last_note_ts:
-                    self.tree.selection_set(note['id'])
-                    self.tree.focus(note['id'])
-                    self.tree.see(note['id'])
-                    break
-
-    def populate_tree(self, notes_to_display):
-        """Fills the Treeview with notes, organized by year and month."""
+        self.cache = open_cache(self.store)
+        self.current_note_id = None
+        self.store_generation = None
+        self.watch_store()
+        self.display_note_text("")
+        self.reset_tree()
+        self.search_var.set("")
+        self.full_tree_items = []
+
+        if not self.store.exists():
+            self.display_note_text("No annotations file found.")
+            return
+
+        self.set_loading(True)
+        batches = queue.Queue()
+        # The worker gets its own store, as SQLite connections stay on the thread that opened them,
+        # and fills a cache of its own. Until the last batch arrives the UI only looks notes up in
+        # it (edits wait for the load), then it becomes the process-wide cache.
+        worker_store = type(self.store)(self.store.path)
+        self.cache = new_cache(worker_store)
+        threading.Thread(target=read_notes_in_batches, args=(self.cache, batches), daemon=True).start()
+        self.after(LOAD_POLL_MS, self.add_loaded_notes, self.load_generation, batches)
+
+    def add_loaded_notes(self, generation, batches):
+        """Adds the next batch from the loader thread, then checks back for more."""
+        if generation != self.load_generation: return
+        try:
+            item = batches.get_nowait()
+        except queue.Empty:
+            self.after(LOAD_POLL_MS, self.add_loaded_notes, generation, batches)
+            return
+
+        if item is None:
+            share_cache(self.cache, self.store)
+            self.set_loading(False)
+            # Pick up anything written while the notes were loading.
+            self.check_store()
+            return
+        if isinstance(item, int):
+            # The loader announces the total before the first batch.
+            self.load_total = item
+            self.progress_bar.config(maximum=max(item, 1), value=0)
+        else:
+            self.add_notes(item)
+            self.progress_bar.config(value=len(self.all_notes))
+            self.progress_label.config(text=f"Loading notes... {len(self.all_notes)} of {self.load_total}")
+        self.after(1, self.add_loaded_notes, generation, batches)
+
+    @profiled("render.batch")
+    def add_notes(self, notes):
+        """Adds newest-first notes below the ones already in the model and tree."""
+        first_batch = not self.all_notes
+        self.all_notes.extend(notes)
+
+        self.full_tree_items.extend(self.add_tree_notes(notes))
+        if first_batch and notes:
+            self.fill_month(self.month_item_id(notes[0]))
+
+        # Restore the last opened note as soon as it arrives.
+        last_note = self.saved_note(self.settings.get("last_note"))
+        if last_note is not None and self.current_note_id is None and any(n is last_note for n in notes):
+            self.select_note(last_note)
+
+    def set_loading(self, loading):
+        """Shows the progress bar and holds off searches and changes while notes are loading.
+
+        A save or delete made meanwhile would wait on the loader's hold on
+        the store, freezing the window until every note was read.
+        """
+        self.loading = loading
+        state = tk.DISABLED if loading else tk.NORMAL
+        for widget in (self.search_entry, self.search_button, self.clear_button, self.save_button):
+            widget.config(state=state)
+        note_state = tk.DISABLED if loading or self.current_note_id is None else tk.NORMAL
+        for widget in (self.edit_button, self.delete_button):
+            widget.config(state=note_state)
+        if loading:
+            self.progress_label.config(text="Loading notes...")
+            self.progress_bar.config(value=0)
+            self.progress_frame.grid(row=1, column=0, sticky="ew", pady=(5, 0))
+        else:
+            self.progress_frame.grid_remove()
+
+    def saved_note(self, key):
+        """Returns the note a setting refers to, by id or by the timestamp older versions saved."""
+        if not key: return None
+        return self.cache.get(key) or self.cache.get(legacy_note_id(key))
+
+    def select_note(self, note):
+        """Selects a note in the full tree and scrolls it into view."""
+        # The note's month may not have been filled in yet.
+        self.fill_month(self.month_item_id(note))
+        self.tree.selection_set(f"note_{note.id}")
+        self.tree.focus(f"note_{note.id}")
+        self.tree.see(f"note_{note.id}")
+
+    # --- Note Tree ---
+
+    def month_item_id(self, note, prefix=""):
+        """Returns the tree item id of the month node a note belongs under."""
+        dt = note.datetime
+        return f"{prefix}month_{dt.year}_{dt.strftime('%B')}"
+
+    def note_id_for_item(self, item_id):
+        """Returns the note id behind a tree item, or None for year/month nodes."""
+        item_id = str(item_id)
+        if item_id.startswith("search_"): item_id = item_id[len("search_"):]
+        return item_id[len("note_"):] if item_id.startswith("note_") else None
+
+    def display_note_text(self, text):
+        """Replaces the text area's content with plain text."""
+        self.style_generation += 1
+        self.text_area.config(state=tk.NORMAL)
+        self.text_area.delete("1.0", tk.END)
+        self.text_area.insert("1.0", text)
+        self.text_area.config(state=tk.DISABLED)
+
+    def reset_tree(self):
+        """Removes every item, so the next view is built from the current notes."""
         for item in self.tree.get_children(): self.tree.delete(item)
-        notes_by_date = defaultdict(lambda: defaultdict(list))
-        for note in notes_to_display:
-            dt = datetime.fromisoformat(note["timestamp"])
-            notes_by_date[str(dt.year)][dt.strftime("%B")].append(note)
-        
-        for year, months in sorted(notes_by_date.items(), reverse=True):
-            year_id = self.tree.insert("", "end", text=year, open=True, iid=f"year_{year}")
-            for month, notes in sorted(months.items(), key=lambda item: datetime.strptime(item[0], "%B").month, reverse=True):
-                month_id = self.tree.insert(year_id, "end", text=month, open=True, iid=f"month_{year}_{month}")
-                for note in notes:
-                    self.tree.insert(month_id, "end", iid=note['id'], text=note['title'])
+        # A full tree detached by a search is not among the visible children.
+        if self.search_items is not None and self.full_tree_items:
+            self.tree.delete(*self.full_tree_items)
+        self.full_tree_items = None
+        self.search_items = None
+        self.pending_months = {}
+
+    @profiled("render.tree")
+    def populate_tree(self, notes_to_display, prefix=""):
+        """Builds year and month nodes for newest-first notes and returns the year item ids.
+
+        Only the newest month is filled in right away. Search results use a
+        prefix on their item ids so they can sit beside the detached full tree.
+        """
+        year_ids = self.add_tree_notes(notes_to_display, prefix)
+        if year_ids:
+            self.fill_month(self.tree.get_children(year_ids[0])[0])
+        return year_ids
+
+    def add_tree_notes(self, notes, prefix=""):
+        """Adds newest-first notes after the ones already in the tree.
+
+        Each month shows its note count and gets its notes only when it is
+        first opened (see fill_month). Returns the ids of new year nodes.
+        """
+        year_ids, touched_months = [], {}
+        month_id = None
+        for note in notes:
+            if month_id != self.month_item_id(note, prefix):
+                month_id = self.month_item_id(note, prefix)
+                if not self.tree.exists(month_id):
+                    year = note.datetime.year
+                    year_id = f"{prefix}year_{year}"
+                    if not self.tree.exists(year_id):
+                        self.tree.insert("", "end", text=str(year), open=True, iid=year_id)
+                        year_ids.append(year_id)
+                    self.tree.insert(year_id, "end", iid=month_id)
+                    # A placeholder child gives the closed month its expand arrow.
+                    self.tree.insert(month_id, "end", iid=f"{month_id}_placeholder")
+                    self.pending_months[month_id] = []
+            pending = self.pending_months.get(month_id)
+            if pending is not None:
+                pending.append(note)
+            else:
+                self.tree.insert(month_id, "end", iid=f"{prefix}note_{note.id}", text=note.title)
+            touched_months[month_id] = note
+
+        for month_id, note in touched_months.items():
+            self.update_month(month_id, note)
+        return year_ids
+
+    @profiled("render.month")
+    def fill_month(self, month_id):
+        """Inserts the notes of a month node the first time it is needed."""
+        notes = self.pending_months.pop(month_id, None)
+        if notes is None: return
+        prefix = "search_" if month_id.startswith("search_") else ""
+        self.tree.delete(f"{month_id}_placeholder")
+        for note in notes:
+            self.tree.insert(month_id, "end", iid=f"{prefix}note_{note.id}", text=note.title)
+        self.tree.item(month_id, open=True)
+
+    def on_tree_open(self, event):
+        """Fills in a month node as it is expanded."""
+        self.fill_month(self.tree.focus())
+
+    def show_all_notes(self):
+        """Shows the full tree, reattaching the cached one instead of rebuilding it."""
+        if self.search_items is None and self.full_tree_items is not None:
+            return
+        self.clear_search_results()
+        self.search_items = None
+        if self.full_tree_items is None:
+            self.full_tree_items = self.populate_tree(self.all_notes)
+        else:
+            for index, year_id in enumerate(self.full_tree_items):
+                self.tree.move(year_id, "", index)
+
+    @profiled("render.search_results")
+    def show_search_results(self, notes, ranked=False):
+        """Replaces the visible tree with search results, keeping the full tree aside.
+
+        Ranked results are listed flat in their given order; others are
+        grouped by year and month like the full tree.
+        """
+        if self.search_items is None and self.full_tree_items:
+            self.tree.detach(*self.full_tree_items)
+        self.clear_search_results()
+        if ranked:
+            for note in notes:
+                self.search_items.append(self.tree.insert("", "end", iid=f"search_note_{note.id}", text=note.title))
+        else:
+            self.search_items = self.populate_tree(notes, prefix="search_")
+
+    def clear_search_results(self):
+        if self.search_items:
+            self.tree.delete(*self.search_items)
+        self.search_items = []
+        self.pending_months = {k: v for k, v in self.pending_months.items() if not k.startswith("search_")}
 
     def on_tree_select(self, event):
         """Handles the event when a user clicks on a note in the list."""
         selected_id = self.tree.selection()
-        if not selected_id or not str(selected_id[0]).isdigit():
+        note_id = self.note_id_for_item(selected_id[0]) if selected_id else None
+        if note_id is None:
             self.edit_button.config(state=tk.DISABLED)
             self.delete_button.config(state=tk.DISABLED)
             return
-        self.current_note_id = int(selected_id[0])
-        self.edit_button.config(state=tk.NORMAL)
-        self.delete_button.config(state=tk.NORMAL)
+        self.current_note_id = note_id
+        # Notes can be read while loading, but not changed until it is done.
+        state = tk.DISABLED if self.loading else tk.NORMAL
+        self.edit_button.config(state=state)
+        self.delete_button.config(state=state)
         self.display_note()
 
     def on_double_click(self, event):
         """Enters edit mode when a note is double-clicked."""
         if self.tree.selection(): self.enter_edit_mode()
 
+    @profiled("render.note")
     def display_note(self):
         """Displays the content of the currently selected note in the text area."""
         if self.current_note_id is None: return
         
-        note = next((n for n in self.all_notes if n['id'] == self.current_note_id), None)
+        note = self.cache.get(self.current_note_id)
         if not note: 
-            self.text_area.config(state=tk.NORMAL)
-            self.text_area.delete("1.0", tk.END)
-            self.text_area.config(state=tk.DISABLED)
+            self.display_note_text("")
             self.current_note_id = None
             self.edit_button.config(state=tk.DISABLED)
             self.delete_button.config(state=tk.DISABLED)
@@ -323,45 +563,73 @@ class AnnotationViewer(tk.Tk):
 
         self.text_area.config(state=tk.NORMAL)
         self.text_area.delete("1.0", tk.END)
-        self.text_area.insert("1.0", note['original_content'])
-        self.apply_styling()
+        self.text_area.insert("1.0", note.content)
+        self.apply_styling(note.content)
         self.text_area.config(state=tk.DISABLED)
 
-    def apply_styling(self):
-        """Applies all formatting to the text area using regex and tags."""
-        content = self.text_area.get("1.0", tk.END)
+    @profiled("render.styling")
+    def apply_styling(self, content):
+        """Applies all formatting to the text area from the parsed markup spans.
+
+        Small notes are styled at once. Larger ones get the lines currently
+        on screen styled first and the rest in batches, so even a note with
+        thousands of checklist lines shows up immediately.
+        """
+        self.style_generation += 1
         for tag in self.text_area.tag_names(): self.text_area.tag_remove(tag, "1.0", tk.END)
 
-        # Handle inline tags like <h>, <i>, <c>
-        for tag, pattern in [("h", "highlight"), ("i", "important"), ("c", "code")]:
-            for match in re.finditer(f"<{tag}>(.*?)</{tag}>", content, re.DOTALL):
-                start_tag, end_tag = match.span(0)
-                start_content, end_content = match.span(1)
-                self.text_area.tag_add(pattern, f"1.0+{start_content}c", f"1.0+{end_content}c")
-                self.text_area.tag_add("hidden", f"1.0+{start_tag}c", f"1.0+{start_content}c")
-                self.text_area.tag_add("hidden", f"1.0+{end_content}c", f"1.0+{end_tag}c")
-        
-        # Handle line-based formatting like checklists and lists
-        for i, line in enumerate(content.split('\n')):
-            line_num = i + 1
-            if re.match(r'^\s*\[x\].*$', line):
-                self.text_area.tag_add("checklist_done", f"{line_num}.0", f"{line_num}.end")
-            elif re.match(r'^\s*\[ \].*$', line):
-                self.text_area.tag_add("checklist_pending", f"{line_num}.0", f"{line_num}.end")
-            elif re.match(r'^\s*([\*\-]|\\\d+\.)\s+.*$', line):
-                self.text_area.tag_add("list_bullet", f"{line_num}.0", f"{line_num}.end")
+        spans = parse_markup(content)
+        line_starts = markup_line_starts(content)
+        if len(content) <= PROGRESSIVE_STYLING_CHARS:
+            self.add_style_ranges(spans, line_starts)
+            return
+
+        first_line = int(self.text_area.index("@0,0").split(".")[0])
+        last_line = int(self.text_area.index(f"@0,{self.text_area.winfo_height()}").split(".")[0])
+        visible_start = line_starts[first_line - 1]
+        visible_end = line_starts[last_line] if last_line < len(line_starts) else len(content)
+        visible, rest = [], []
+        for span in spans:
+            (visible if span[2] >= visible_start and span[1] <= visible_end else rest).append(span)
+        self.add_style_ranges(visible, line_starts)
+        self.after_idle(self.style_next_batch, self.style_generation, rest, 0, line_starts)
+
+    @profiled("render.styling.batch")
+    def style_next_batch(self, generation, spans, position, line_starts):
+        """Styles the next batch of a large note, unless the text area has changed since."""
+        if generation != self.style_generation: return
+        self.add_style_ranges(spans[position:position + STYLE_BATCH_SPANS], line_starts)
+        position += STYLE_BATCH_SPANS
+        if position < len(spans):
+            self.after(1, self.style_next_batch, generation, spans, position, line_starts)
+
+    def add_style_ranges(self, spans, line_starts):
+        """Tags spans with one Tk call per tag, using line.col indices.
+
+        Character-offset indices like "1.0+1234c" make Tk count from the top
+        of the text for every range; line.col indices are resolved directly.
+        """
+        for tag, indices in markup_tag_ranges(spans, line_starts).items():
+            self.text_area.tag_add(tag, *indices)
 
     def enter_edit_mode(self):
         """Switches the UI to editing mode."""
-        if self.current_note_id is None: return
+        if self.current_note_id is None or self.loading: return
+        # Saving checks this against the store, in case another program changed the note meanwhile.
+        self.editing_note = self.cache.get(self.current_note_id)
         self.edit_button.pack_forget()
         self.delete_button.pack_forget()
         self.save_button.pack(side=tk.LEFT, padx=(0, 5))
         self.cancel_button.pack(side=tk.LEFT)
-        self.style_bar.grid(row=2, column=0, sticky="ew", pady=(5, 0))
+        self.style_frame.grid(row=2, column=0, sticky="ew", pady=(5, 0))
         self.text_area.config(state=tk.NORMAL)
         # Remove all styling tags to show the raw markdown
+        self.style_generation += 1
         for tag in self.text_area.tag_names(): self.text_area.tag_remove(tag, "1.0", tk.END)
+        self.editing = True
+        self.text_area.edit_modified(False)
+        # The live preview styles the markup but leaves it visible for editing.
+        if self.live_styling.get(): self.restyle_all_lines()
 
     def exit_edit_mode(self, cancel=False):
         """Switches the UI back to viewing mode."""
@@ -369,44 +637,284 @@ class AnnotationViewer(tk.Tk):
         self.cancel_button.pack_forget()
         self.edit_button.pack(side=tk.LEFT)
         self.delete_button.pack(side=tk.LEFT, padx=(5,0))
-        self.style_bar.grid_forget()
+        self.style_frame.grid_forget()
+        self.editing = False
+        self.live_dirty_lines = None
+        if self.live_style_job is not None:
+            self.after_cancel(self.live_style_job)
+            self.live_style_job = None
         if cancel:
             self.display_note() # Reload the note to show styling
 
+    def on_live_styling_toggle(self):
+        """Turns the live preview on or off, restyling the note being edited."""
+        self.settings["live_styling"] = self.live_styling.get()
+        if not self.editing: return
+        if self.live_styling.get():
+            self.restyle_all_lines()
+        else:
+            for tag in MARKUP_TAGS: self.text_area.tag_remove(tag, "1.0", tk.END)
+
+    def on_text_modified(self, event=None):
+        """Notes which lines an edit touched and schedules a debounced restyle.
+
+        Only the lines around the cursor are recorded, plus any lines the
+        edit added above it, so the cost of a keystroke does not depend on
+        the length of the note.
+        """
+        # Clearing the flag fires <<Modified>> again; ignore that one.
+        if not self.text_area.edit_modified(): return
+        self.text_area.edit_modified(False)
+        if not (self.editing and self.live_styling.get()): return
+
+        line = int(self.text_area.index(tk.INSERT).split(".")[0])
+        line_count = int(self.text_area.index("end-1c").split(".")[0])
+        added = max(0, line_count - self.live_line_count)
+        self.live_line_count = line_count
+        first, last = line - added, line
+        if self.live_dirty_lines is not None:
+            dirty_first, dirty_last = self.live_dirty_lines
+            # Lines added above earlier changes push them down.
+            if dirty_last >= first: dirty_last += added
+            first, last = min(first, dirty_first), max(last, dirty_last)
+        self.live_dirty_lines = (max(first, 1), last)
+
+        if self.live_style_job is not None: self.after_cancel(self.live_style_job)
+        self.live_style_job = self.after(LIVE_STYLE_DELAY_MS, self.restyle_dirty_lines)
+
+    def restyle_all_lines(self):
+        """Styles every line of the note being edited."""
+        self.live_line_count = int(self.text_area.index("end-1c").split(".")[0])
+        self.live_dirty_lines = (1, self.live_line_count)
+        self.restyle_dirty_lines()
+
+    @profiled("render.live_styling")
+    def restyle_dirty_lines(self):
+        """Restyles the lines changed since the last restyle, leaving the markup visible."""
+        self.live_style_job = None
+        if not self.editing or self.live_dirty_lines is None: return
+        first, last = self.live_dirty_lines
+        self.live_dirty_lines = None
+        start, end = f"{first}.0", f"{min(last, self.live_line_count)}.end"
+        for tag in MARKUP_TAGS: self.text_area.tag_remove(tag, start, end)
+
+        text = self.text_area.get(start, end)
+        ranges = markup_tag_ranges(parse_markup(text), markup_line_starts(text), first_line=first, hide_markers=False)
+        for tag, indices in ranges.items():
+            self.text_area.tag_add(tag, *indices)
+
     def save_note(self):
-        """Saves the currently edited note back to the JSON file."""
-        if self.current_note_id is None: return
+        """Saves the currently edited note back to the store.
+
+        Changes other programs made since the note was loaded are merged in
+        first. If one of them touched this very note, the user decides
+        whether to overwrite it (or, if it was deleted, to save a new note).
+        """
+        if self.current_note_id is None or self.loading: return
         new_content = self.text_area.get("1.0", tk.END).strip()
-        
-        note_to_update = next((n for n in self.all_notes if n['id'] == self.current_note_id), None)
-        if note_to_update:
-            # Find the original note in the raw list to update it
-            original_index = -1
-            for i, raw_note in enumerate(self.raw_notes):
-                if raw_note['timestamp'] == note_to_update['timestamp']:
-                    original_index = i
-                    break
-            if original_index != -1:
-                 self.raw_notes[original_index]['content'] = new_content
-
-        with open(ANNOTATIONS_FILE, "w") as f:
-            json.dump(self.raw_notes, f, indent=2)
-        
-        self.load_annotations() # Reload all notes to reflect the change
+
+        self.check_store()
+        note = self.cache.get(self.current_note_id)
+        if note is None:
+            if not messagebox.askyesno("Note Deleted", "Another program deleted this note while you were editing it.\n\nSave your text as a new note?"):
+                return
+            # It keeps its place in the tree, under a new id.
+            added = self.store.add(new_content, self.editing_note.timestamp)
+            self.current_note_id = added["id"]
+            self.cache.notes_added([added])
+            self.insert_note(self.cache.get(added["id"]))
+        else:
+            if note is not self.editing_note and note.content != self.editing_note.content:
+                if not messagebox.askyesno("Note Changed", "Another program changed this note while you were editing it.\n\nReplace those changes with yours?"):
+                    return
+            if not self.store.update(note.id, new_content, self.store_generation):
+                # Another program wrote between the check and the write, maybe
+                # while a dialog was open. Its changes are merged in and the
+                # save starts over, unless they couldn't be read.
+                generation = self.store_generation
+                self.check_store()
+                if self.store_generation != generation: self.save_note()
+                else: messagebox.showerror("Save Failed", "Another program changed the notes, and they could not be reread. Your text is still in the editor.")
+                return
+            # Swaps in the reparsed note where it stands; the tree keeps its selection and scroll.
+            self.replace_note(note, self.cache.note_changed(note.id, new_content))
+        self.own_change_saved()
         self.exit_edit_mode(cancel=True)
+        if note is None: self.select_note(self.cache.get(self.current_note_id))
 
     def delete_note(self):
         """Deletes the currently selected note after a confirmation dialog."""
-        if self.current_note_id is None: return
+        if self.current_note_id is None or self.loading: return
 
-        note_to_delete = next((n for n in self.all_notes if n['id'] == self.current_note_id), None)
+        note_to_delete = self.cache.get(self.current_note_id)
         if not note_to_delete: return
 
-        if messagebox.askyesno("Delete Note", f"Are you sure you want to delete the note titled: \n'{note_to_delete['title']}'?"):
-            self.raw_notes = [n for n in self.raw_notes if n['timestamp'] != note_to_delete['timestamp']]
-            with open(ANNOTATIONS_FILE, "w") as f:
-                json.dump(self.raw_notes, f, indent=2)
-            self.load_annotations()
+        if messagebox.askyesno("Delete Note", f"Are you sure you want to delete the note titled: \n'{note_to_delete.title}'?"):
+            self.store.delete(note_to_delete.id)
+            self.cache.note_changed(note_to_delete.id)
+            self.remove_note(note_to_delete)
+            self.own_change_saved()
+
+    # --- Live Reload ---
+
+    def watch_store(self):
+        """Starts watching the current store's files for changes made elsewhere."""
+        if self.watcher is not None:
+            if self.watcher.fileno() is not None: self.tk.deletefilehandler(self.watcher.fileno())
+            self.watcher.close()
+        self.watcher = StoreWatcher(self.store)
+        if self.watcher.fileno() is not None:
+            try:
+                self.tk.createfilehandler(self.watcher.fileno(), tk.READABLE, self.on_store_event)
+            except (AttributeError, RuntimeError, tk.TclError):
+                # Tk builds without file handlers get polled instead.
+                self.watcher.close()
+        if self.watcher.fileno() is None and self.reload_job is None:
+            self.reload_job = self.after(RELOAD_POLL_MS, self.poll_store)
+
+    def on_store_event(self, fd, mask):
+        """Schedules a check once the store's files have stopped changing for a moment."""
+        if not self.watcher.changed(): return
+        if self.reload_job is not None: self.after_cancel(self.reload_job)
+        self.reload_job = self.after(RELOAD_DELAY_MS, self.poll_store)
+
+    def poll_store(self):
+        """Checks the store, and keeps polling it every RELOAD_POLL_MS without inotify."""
+        self.reload_job = None
+        self.check_store()
+        if self.watcher.fileno() is None:
+            self.reload_job = self.after(RELOAD_POLL_MS, self.poll_store)
+
+    def check_store(self):
+        """Merges in external changes, if the store's generation says there are any."""
+        if self.loading or self.cache is None: return
+        try:
+            if self.store.generation() == self.store_generation: return
+        except OSError:
+            return
+        self.apply_store_changes()
+
+    def own_change_saved(self):
+        """Marks the store as in step after the viewer applied its own write.
+
+        Writes are made right after check_store() (edits only if the store
+        is still where it left it), so the model already held every other
+        change; moving the generation on keeps the watcher's event for this
+        write from merging it in a second time.
+        """
+        try:
+            self.store_generation = self.store.generation()
+        except OSError:
+            self.store_generation = None
+
+    @profiled("reload")
+    def apply_store_changes(self):
+        """Merges changes other programs made into the model and tree, one changed note at a time."""
+        if self.loading or self.cache is None: return
+        # Imported where its errors are caught: only SQLite stores and the
+        # text index raise them, and the window opens sooner without it.
+        import sqlite3
+        try:
+            generation = self.store.generation()
+            changes = self.cache.refresh()
+        except (json.JSONDecodeError, sqlite3.Error, OSError):
+            return
+        self.store_generation = generation
+
+        current_changed = False
+        for key, old in changes.items():
+            new = self.cache.get(key)
+            if old is None:
+                if new is not None: self.insert_note(new)
+                continue
+            if new is None:
+                self.remove_note(old)
+            elif new is not old and new.content != old.content:
+                # A rebuilt cache has new records for every note; only real edits count.
+                self.replace_note(old, new)
+            else:
+                continue
+            current_changed = current_changed or key == self.current_note_id
+        if current_changed and not self.editing:
+            self.display_note()
+
+    def insert_note(self, note):
+        """Adds a note written elsewhere to the model and the full tree, in date order."""
+        self.all_notes.insert(note_slot(self.all_notes, note.epoch), note)
+        if self.full_tree_items is None: return
+
+        month_id = self.month_item_id(note)
+        if not self.tree.exists(month_id):
+            year, month = note.datetime.year, note.datetime.month
+            year_id = f"year_{year}"
+            if not self.tree.exists(year_id):
+                index = sum(1 for item in self.full_tree_items if int(item[len("year_"):]) > year)
+                self.tree.insert("", index if self.search_items is None else "end", text=str(year), open=True, iid=year_id)
+                # While search results are shown, the full tree stays detached.
+                if self.search_items is not None: self.tree.detach(year_id)
+                self.full_tree_items.insert(index, year_id)
+            index = sum(1 for item in self.tree.get_children(year_id) if month_number(item) > month)
+            self.tree.insert(year_id, index, iid=month_id)
+            self.tree.insert(month_id, "end", iid=f"{month_id}_placeholder")
+            self.pending_months[month_id] = []
+
+        pending = self.pending_months.get(month_id)
+        if pending is not None:
+            pending.insert(note_slot(pending, note.epoch), note)
+        else:
+            index = sum(1 for item in self.tree.get_children(month_id)
+                        if self.cache.get(self.note_id_for_item(item)).epoch >= note.epoch)
+            self.tree.insert(month_id, index, iid=f"note_{note.id}", text=note.title)
+        self.update_month(month_id, note)
+
+    def replace_note(self, note, updated):
+        """Puts an edited note's new record in place of the old one, model and tree alike."""
+        self.all_notes[find_note(self.all_notes, note)] = updated
+        for prefix in ("", "search_"):
+            pending = self.pending_months.get(self.month_item_id(note, prefix))
+            position = find_note(pending, note) if pending is not None else None
+            if position is not None:
+                pending[position] = updated
+            item_id = f"{prefix}note_{note.id}"
+            if self.tree.exists(item_id): self.tree.item(item_id, text=updated.title)
+
+    def remove_note(self, note):
+        """Drops a deleted note from the model and from every tree item showing it."""
+        del self.all_notes[find_note(self.all_notes, note)]
+        for prefix in ("", "search_"):
+            item_id, month_id = f"{prefix}note_{note.id}", self.month_item_id(note, prefix)
+            pending = self.pending_months.get(month_id)
+            position = find_note(pending, note) if pending is not None else None
+            if position is not None:
+                del pending[position]
+            elif self.tree.exists(item_id):
+                if self.tree.parent(item_id) == "":
+                    # A flat, ranked search result.
+                    self.tree.delete(item_id)
+                    self.search_items.remove(item_id)
+                    continue
+                self.tree.delete(item_id)
+            else:
+                continue
+            self.update_month(month_id, note)
+        # Clears the text area if the deleted note was the one shown.
+        if note.id == self.current_note_id and not self.editing:
+            self.display_note()
+
+    def update_month(self, month_id, note):
+        """Refreshes a month's note count, removing the month and year once empty."""
+        pending = self.pending_months.get(month_id)
+        count = len(pending) if pending is not None else len(self.tree.get_children(month_id))
+        if count:
+            self.tree.item(month_id, text=f"{note.datetime.strftime('%B')} ({count})")
+            return
+        year_id = self.tree.parent(month_id)
+        self.tree.delete(month_id)
+        self.pending_months.pop(month_id, None)
+        if not self.tree.get_children(year_id):
+            self.tree.delete(year_id)
+            for items in (self.full_tree_items, self.search_items):
+                if items and year_id in items: items.remove(year_id)
 
     def on_theme_change(self, event):
         """Saves the new theme and reapplies it to the UI."""
@@ -418,38 +926,66 @@ class AnnotationViewer(tk.Tk):
     def on_closing(self):
         """Saves settings before the application window is closed."""
         if self.current_note_id is not None:
-            note = next((n for n in self.all_notes if n['id'] == self.current_note_id), None)
+            note = self.cache.get(self.current_note_id)
             if note:
-                self.settings["last_note"] = note["timestamp"]
+                self.settings["last_note"] = note.id
         save_settings(self.settings)
+        # Closing the viewer is a quiet moment to fold the journal back in.
+        try: self.store.maybe_compact()
+        except (OSError, json.JSONDecodeError): pass
         self.destroy()
 
+    def run_search(self, event=None):
+        """Runs the search selected in the mode menu."""
+        if self.search_mode.get() == "Text":
+            self.search_by_text()
+        else:
+            self.search_by_tag()
+
     def search_by_tag(self, event=None):
         """Filters the notes in the Treeview based on a tag search."""
         search_term = self.search_var.get().strip().lower()
         if not search_term:
-            self.populate_tree(self.all_notes)
+            self.show_all_notes()
             return
         
         if search_term.startswith('#'): search_term = search_term[1:]
 
-        filtered_notes = [
-            note for note in self.all_notes 
-            if any(search_term == tag.lower() for tag in note['tags'])
-        ]
-        self.populate_tree(filtered_notes)
+        # Let the store answer from its tag index, then keep the tree's order.
+        matching = self.store.tag_keys(search_term)
+        filtered_notes = [note for note in self.all_notes if note.id in matching]
+        self.show_search_results(filtered_notes)
+
+    def search_by_text(self, event=None):
+        """Lists the notes matching a full-text query, best match first."""
+        query = self.search_var.get().strip()
+        if not query:
+            self.show_all_notes()
+            return
+
+        import sqlite3
+        try:
+            ranked_keys = self.store.text_keys(query)
+        except (json.JSONDecodeError, sqlite3.Error) as e:
+            messagebox.showerror("Search Failed", f"Could not search the notes:\n{e}")
+            return
+        notes = [self.cache.get(key) for key in ranked_keys]
+        self.show_search_results([note for note in notes if note is not None], ranked=True)
 
     def clear_search(self):
         """Clears the search filter and shows all notes."""
         self.search_var.set("")
-        self.populate_tree(self.all_notes)
+        self.show_all_notes()
         self.tree.focus_set()
 
     # --- GUI Wrappers for Utility Functions ---
+    # The utilities are imported when first used, so the window can open
+    # without loading them.
     def gui_export_notes(self):
         """Opens a dialog to choose a directory for exporting notes."""
         target_dir = filedialog.askdirectory(title="Select Export Directory")
         if target_dir:
+            from anno_app.anno_utils import export_notes
             if export_notes(target_dir):
                 messagebox.showinfo("Export Successful", f"All notes have been exported to {target_dir}")
             else:
@@ -457,14 +993,19 @@ class AnnotationViewer(tk.Tk):
 
     def gui_backup_notes(self):
         """Triggers the backup process and shows a confirmation message."""
-        backup_path = backup_notes()
-        if backup_path:
-            messagebox.showinfo("Backup Successful", f"Backup created at:\n{backup_path}")
+        from anno_app.anno_utils import backup_notes
+        backup_name = backup_notes()
+        if backup_name:
+            messagebox.showinfo("Backup Successful", f"Backup created:\n{backup_name}")
         else:
             messagebox.showerror("Backup Failed", "Could not create backup. See terminal for details.")
 
     def gui_restore_notes(self):
         """Opens a new window to select and restore a backup."""
+        if self.loading:
+            messagebox.showinfo("Restore", "Please wait until all notes have loaded.")
+            return
+        from anno_app.anno_utils import list_backups, describe_backups, restore_notes
         backups = list_backups()
         if not backups:
             messagebox.showinfo("Restore", "No backups found.")
@@ -474,10 +1015,11 @@ class AnnotationViewer(tk.Tk):
         win.title("Restore from Backup")
         ttk.Label(win, text="Select a backup to restore:").pack(padx=10, pady=10)
         
-        listbox = tk.Listbox(win, width=50, height=15)
+        listbox = tk.Listbox(win, width=110, height=15)
         listbox.pack(padx=10, pady=10)
-        for b in backups:
-            listbox.insert(tk.END, b)
+        # Each backup is described from the backup catalog, without opening it.
+        for description in describe_backups(backups):
+            listbox.insert(tk.END, description)
 
         def on_restore():
             selection = listbox.curselection()
@@ -485,11 +1027,12 @@ class AnnotationViewer(tk.Tk):
                 messagebox.showwarning("No Selection", "Please select a backup file.")
                 return
             
-            selected_backup = listbox.get(selection[0])
+            selected_backup = backups[selection[0]]
             if messagebox.askyesno("Confirm Restore", f"Are you sure you want to restore from:\n{selected_backup}\n\nThis will overwrite your current notes."):
                 if restore_notes(selected_backup):
                     messagebox.showinfo("Restore Successful", "Notes restored. The application will now reload.")
                     win.destroy()
+                    self.store = open_store() # The restored file replaced the one we had open
                     self.load_annotations() # Reload notes to show the restored data
                 else:
                     messagebox.showerror("Restore Failed", "Could not restore notes. See terminal for details.")
@@ -497,6 +1040,96 @@ class AnnotationViewer(tk.Tk):
         ttk.Button(win, text="Restore", command=on_restore).pack(pady=5)
         ttk.Button(win, text="Cancel", command=win.destroy).pack(pady=5)
 
+# --- Markup Styling ---
+
+def markup_line_starts(content):
+    """Returns the character offset at which each line of content starts."""
+    starts = [0]
+    newline = content.find("\n")
+    while newline >= 0:
+        starts.append(newline + 1)
+        newline = content.find("\n", newline + 1)
+    return starts
+
+def markup_tag_ranges(spans, line_starts, first_line=1, hide_markers=True):
+    """Converts markup spans to Tk line.col index pairs, grouped by text tag.
+
+    first_line is the text line the spans' offsets start on. The live
+    preview keeps inline tags visible by passing hide_markers=False.
+    """
+    def index(offset):
+        line = bisect_right(line_starts, offset) - 1
+        return f"{line + first_line}.{offset - line_starts[line]}"
+
+    ranges = defaultdict(list)
+    for style, start, end, inner_start, inner_end in spans:
+        if style in INLINE_STYLES.values():
+            # Inline tags like <h>, <i>, <c>: style the text, hide the tags.
+            ranges[style] += (index(inner_start), index(inner_end))
+            if hide_markers:
+                ranges["hidden"] += (index(start), index(inner_start), index(inner_end), index(end))
+        else:
+            # Checklists and lists style the whole line.
+            ranges[style] += (index(start), index(end))
+    return ranges
+
+# --- Note Lists ---
+# The model and the tree's pending months hold notes newest first, so a note
+# is found by binary search on its timestamp. Records are matched by id, as
+# a rebuilt cache hands out new ones for unchanged notes.
+
+def note_slot(notes, epoch):
+    """Returns where a note with this timestamp goes in a newest-first list."""
+    lo, hi = 0, len(notes)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if notes[mid].epoch > epoch:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def find_note(notes, note):
+    """Returns the position of a note in a newest-first list, or None."""
+    i = note_slot(notes, note.epoch)
+    while i < len(notes) and notes[i].epoch == note.epoch:
+        if notes[i].id == note.id: return i
+        i += 1
+    return None
+
+def month_number(month_id):
+    """Returns the month (1-12) of a month item id like month_2024_March."""
+    return datetime.strptime(month_id.rsplit("_", 1)[1], "%B").month
+
+# --- Background Loading ---
+
+@profiled("load.notes")
+def read_notes_in_batches(cache, batches):
+    """Runs on the loader thread: queues the total, then batches of parsed notes, then None.
+
+    When the notes have to be parsed again, each batch is queued as soon as
+    the cache has parsed it, newest first, so the tree fills in while older
+    notes are still being read.
+    """
+    import sqlite3
+    queued = 0
+    def parsed(records, total):
+        nonlocal queued
+        if not queued: batches.put(total)
+        for i in range(0, len(records), LOAD_BATCH_SIZE):
+            batches.put(records[i:i + LOAD_BATCH_SIZE])
+        queued += len(records)
+
+    try:
+        # A copy, so saves and deletes made while loading can't shift the batches.
+        records = list(cache.notes(on_parsed=parsed))
+    except (json.JSONDecodeError, sqlite3.Error, OSError):
+        records = []
+    if not queued: batches.put(len(records))
+    for i in range(queued, len(records), LOAD_BATCH_SIZE):
+        batches.put(records[i:i + LOAD_BATCH_SIZE])
+    batches.put(None)
+
 # --- Script Entry Point ---
 if __name__ == "__main__":
     app = AnnotationViewer()
@@ -0,0 +1,65 @@
+import os
+import struct
+import ctypes
+import ctypes.util
+
+# --- inotify ---
+# Linux reports changes to a directory through inotify. It is reached through
+# libc with ctypes; where it is missing, callers fall back to polling.
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+class StoreWatcher:
+    """Reports changes to a store's files as soon as the kernel sees them.
+
+    Watches the directory holding the store, since compaction and restores
+    replace the notes file by renaming a new one over it. fileno() is None
+    when inotify is unavailable.
+    """
+    def __init__(self, store):
+        self.names = {os.path.basename(store.path)}
+        # The JSON and pack journals, and SQLite's rollback and WAL files.
+        for suffix in (".journal", "-journal", "-wal"):
+            self.names.add(os.path.basename(store.path) + suffix)
+        self.fd = None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return
+            directory = os.path.dirname(store.path) or "."
+            if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+                os.close(fd)
+                return
+            self.fd = fd
+        except (OSError, AttributeError):
+            # No libc or no inotify (e.g. on macOS).
+            self.fd = None
+
+    def fileno(self):
+        return self.fd
+
+    def changed(self):
+        """Reads the pending events and returns whether any concerned the store's files."""
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                changed = changed or os.fsdecode(name) in self.names
+                offset += EVENT_HEADER.size + length
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
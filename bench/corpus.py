@@ -0,0 +1,144 @@
+"""Generates deterministic corpora of notes for the benchmarks.
+
+Usage: python3 bench/corpus.py --notes 10k [--backend json|sqlite|pack|all] [--seed N] HOME
+
+Writes the notes into HOME/.local/share the way anno itself stores them,
+so that running anno with that HOME sees them. The same --notes and --seed
+always give the same notes. Sizes may be given as 1k, 10k, 100k or 1m.
+
+Notes are shaped after real captures rather than uniform filler: a few tags
+are used far more than the rest, most notes are a few lines long with a
+tail of long ones, and a share of them carry checklists, lists and inline
+<h>, <i> and <c> markup.
+"""
+import os
+import sys
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anno_app.anno_store import ANNOTATIONS_FILE, DATABASE_FILE, PACK_FILE, BACKENDS, JournalStore, SqliteStore
+
+# --- Vocabulary ---
+WORDS = ("meeting notes project idea follow up review draft bug fix release plan "
+         "design call email todo research read write test deploy budget client "
+         "schedule report update question answer backlog sprint team lunch book "
+         "article paper recipe garden trip flight hotel invoice tax doctor gym").split()
+# Ordered from most to least used; tag i is picked with weight 1 / (i + 1).
+TAGS = ("work todo ideas reading home journal code meeting travel health finance "
+        "books recipes garden music family projects learning writing research "
+        "shopping movies photos car house kids gifts events taxes insurance").split()
+TAG_WEIGHTS = [1 / (i + 1) for i in range(len(TAGS))]
+# How many tags a note has: 0, 1, 2, 3 or 4.
+TAG_COUNT_WEIGHTS = (25, 35, 25, 10, 5)
+
+# --- Shape of a Note ---
+# Body lines follow a log-normal distribution: median around 5 lines, with
+# the occasional long meeting log or list of hundreds of lines.
+BODY_LINES_MU = 1.6
+BODY_LINES_SIGMA = 1.0
+BODY_LINES_MAX = 400
+# The share of notes holding each kind of block, and its length in lines.
+CHECKLIST_SHARE = 0.15
+CHECKLIST_LINES = (2, 12)
+CHECKLIST_DONE_SHARE = 0.4
+BULLET_LIST_SHARE = 0.2
+NUMBERED_LIST_SHARE = 0.08
+LIST_LINES = (2, 8)
+# The chance that a line of prose marks up a few words with each inline tag.
+INLINE_MARKUP_SHARE = {"h": 0.08, "i": 0.05, "c": 0.06}
+# Notes are spread over about ten years, more densely in recent ones.
+CORPUS_START = datetime(2015, 1, 1)
+CORPUS_SPAN = timedelta(days=3650)
+
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000, "1m": 1000000}
+STORE_FILES = {"json": ANNOTATIONS_FILE, "sqlite": DATABASE_FILE, "pack": PACK_FILE}
+
+def parse_size(size):
+    """Returns the note count of a size such as 10k or 1m, or a plain number."""
+    return SIZES.get(size.lower()) or int(size)
+
+def prose_line(rng):
+    words = rng.choices(WORDS, k=rng.randint(4, 14))
+    for tag, share in INLINE_MARKUP_SHARE.items():
+        if rng.random() < share:
+            start = rng.randrange(len(words))
+            end = min(len(words), start + rng.randint(1, 3))
+            words[start] = f"<{tag}>{words[start]}"
+            words[end - 1] = f"{words[end - 1]}</{tag}>"
+    return " ".join(words)
+
+def item_text(rng):
+    return " ".join(rng.choices(WORDS, k=rng.randint(2, 6)))
+
+def note_body(rng):
+    """Returns the lines of a note's body: prose with the odd checklist or list."""
+    count = min(BODY_LINES_MAX, max(1, int(rng.lognormvariate(BODY_LINES_MU, BODY_LINES_SIGMA))))
+    lines = [prose_line(rng) for _ in range(count)]
+    blocks = []
+    if rng.random() < CHECKLIST_SHARE:
+        blocks.append([("[x] " if rng.random() < CHECKLIST_DONE_SHARE else "[ ] ") + item_text(rng)
+                       for _ in range(rng.randint(*CHECKLIST_LINES))])
+    if rng.random() < BULLET_LIST_SHARE:
+        bullet = rng.choice("*-")
+        blocks.append([f"{bullet} {item_text(rng)}" for _ in range(rng.randint(*LIST_LINES))])
+    if rng.random() < NUMBERED_LIST_SHARE:
+        blocks.append([f"{i + 1}. {item_text(rng)}" for i in range(rng.randint(*LIST_LINES))])
+    for block in blocks:
+        at = rng.randint(0, len(lines))
+        lines[at:at] = block
+    return lines
+
+def generate_corpus(count, seed=1):
+    """Returns count notes, oldest first, as the stores hold them: content, timestamp and id."""
+    rng = random.Random(seed)
+    # Sorted uniform draws of the square root crowd notes towards recent years.
+    offsets = sorted(CORPUS_SPAN.total_seconds() * rng.random() ** 0.5 for _ in range(count))
+    notes = []
+    for offset in offsets:
+        title = " ".join(rng.choices(WORDS, k=rng.randint(2, 6))).capitalize()
+        tag_count = rng.choices(range(len(TAG_COUNT_WEIGHTS)), weights=TAG_COUNT_WEIGHTS)[0]
+        tags = []
+        while len(tags) < tag_count:
+            tag = rng.choices(TAGS, weights=TAG_WEIGHTS)[0]
+            if tag not in tags: tags.append(tag)
+        body = "\n".join(note_body(rng))
+        content = f"{title}\n[{', '.join('#' + t for t in tags)}]\n{body}" if tags else f"{title}\n{body}"
+        timestamp = (CORPUS_START + timedelta(seconds=offset)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        notes.append({"content": content, "timestamp": timestamp, "id": f"{rng.getrandbits(64):016x}"})
+    return notes
+
+def store_path(home, backend):
+    """Returns where anno keeps a backend's notes when run with this HOME."""
+    return os.path.join(home, ".local", "share", os.path.basename(STORE_FILES[backend]))
+
+def write_store(notes, backend, home):
+    """Writes notes into a backend's store under home and returns the store's path."""
+    path = store_path(home, backend)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if backend == "sqlite":
+        store = SqliteStore(path)
+        store.replace_all(notes)
+        store.close()
+    elif backend == "pack":
+        # Imported here, like in open_store, since the pack store builds on anno_store.
+        from anno_app.anno_pack import PackStore
+        PackStore(path).replace_all(notes)
+    else:
+        JournalStore(path).replace_all(notes)
+    return path
+
+# --- Script Entry Point ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a generated corpus of notes into a HOME directory.")
+    parser.add_argument("home", help="Directory to use as HOME when running anno against the notes.")
+    parser.add_argument("--notes", default="10k", help="Number of notes: 1k, 10k, 100k, 1m or any number.")
+    parser.add_argument("--backend", choices=BACKENDS + ("all",), default="json", help="Store format to write.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the generator.")
+    args = parser.parse_args()
+
+    notes = generate_corpus(parse_size(args.notes), args.seed)
+    for backend in BACKENDS if args.backend == "all" else (args.backend,):
+        print(f"Wrote {len(notes)} notes to {write_store(notes, backend, args.home)}")
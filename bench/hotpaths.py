@@ -0,0 +1,300 @@
+"""Times anno's hot paths on generated corpora, for every size and backend.
+
+Usage: python3 bench/hotpaths.py [--sizes 1k,10k,100k] [--backends json,sqlite,pack]
+                                 [--repeat N] [--output FILE] [--compare OLD_FILE]
+
+For each size a corpus is generated once (see corpus.py) and written into
+each backend's store in a scratch HOME. The benchmarks run in a child
+process with that HOME, since anno's paths are fixed when it is imported.
+Each is repeated --repeat times; the median and the fastest run are kept.
+
+  parse_note_content      parse every note's title, tags and body
+  get_all_notes.cold      load every note with no note cache on disk
+  get_all_notes.cached    load every note from the cache a previous run left
+  search.tag              `anno -s work`, output discarded
+  search.text             `anno -s --text "review draft"`, output discarded
+  apply_terminal_styling  style every note's body for the terminal
+  export.full             export every note into an empty directory
+  export.unchanged        export again, with nothing to write
+  backup.full             back up into an empty backup repository
+  backup.unchanged        back up again, with every note already stored
+  restore                 verify the newest backup and restore from it
+  gui.populate_tree       build the GUI's note tree, against a fake Treeview
+  gui.apply_styling       style every note in the GUI, against a fake Text
+
+The GUI benchmarks run the viewer's own methods without opening a window,
+so they need tkinter installed but no display. Results are written as JSON,
+with the commit and Python version they were measured on; --compare prints
+how each timing changed against an earlier results file.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from corpus import BACKENDS, generate_corpus, parse_size, write_store
+
+DEFAULT_SIZES = "1k,10k,100k"
+DEFAULT_REPEAT = 3
+SEARCH_TAG = "work"
+SEARCH_TEXT = "review draft"
+# The fake text area's size, in lines, when the viewer asks what is on screen.
+VISIBLE_LINES = 40
+
+# --- Fake Widgets ---
+# Just enough of ttk.Treeview and tk.Text for the viewer's tree and styling
+# code, so their Python side can be timed without Tk.
+
+class FakeTree:
+    def __init__(self):
+        self.children = {"": []}
+        self.parents = {}
+        self.items = {}
+
+    def insert(self, parent, index, iid=None, **options):
+        self.children[parent].append(iid)
+        self.children[iid] = []
+        self.parents[iid] = parent
+        self.items[iid] = options
+        return iid
+
+    def exists(self, iid):
+        return iid in self.items
+
+    def get_children(self, iid=""):
+        return tuple(self.children[iid])
+
+    def parent(self, iid):
+        return self.parents[iid]
+
+    def item(self, iid, **options):
+        self.items[iid].update(options)
+
+    def delete(self, *iids):
+        for iid in iids:
+            for child in self.children.pop(iid):
+                self.delete(child)
+            self.children[self.parents.pop(iid)].remove(iid)
+            del self.items[iid]
+
+class FakeText:
+    def __init__(self):
+        self.ranges = 0
+
+    def tag_names(self):
+        return ()
+
+    def tag_remove(self, tag, start, end):
+        pass
+
+    def tag_add(self, tag, *indices):
+        self.ranges += len(indices) // 2
+
+    def index(self, position):
+        return "1.0" if position == "@0,0" else f"{VISIBLE_LINES}.0"
+
+    def winfo_height(self):
+        return VISIBLE_LINES
+
+def headless_viewer():
+    """Returns a stand-in for AnnotationViewer running its tree and styling methods, or None without tkinter."""
+    try:
+        # Imported here: anno_viewer loads tkinter, which may not be installed.
+        from anno_app.anno_viewer import AnnotationViewer
+    except ImportError:
+        return None
+
+    class HeadlessViewer:
+        def __init__(self):
+            self.tree = FakeTree()
+            self.text_area = FakeText()
+            self.pending_months = {}
+            self.full_tree_items = self.search_items = None
+            self.style_generation = 0
+            self.scheduled = []
+
+        def after_idle(self, callback, *args):
+            self.scheduled.append((callback, args))
+
+        def after(self, ms, callback, *args):
+            self.scheduled.append((callback, args))
+
+        def run_scheduled(self):
+            while self.scheduled:
+                callback, args = self.scheduled.pop(0)
+                callback(*args)
+
+    for name in ("populate_tree", "add_tree_notes", "fill_month", "month_item_id", "update_month",
+                 "apply_styling", "style_next_batch", "add_style_ranges"):
+        setattr(HeadlessViewer, name, getattr(AnnotationViewer, name))
+    return HeadlessViewer
+
+# --- Benchmarks ---
+# Each runs in the child process, with HOME pointing at the corpus.
+
+@contextmanager
+def quiet():
+    """Discards what anno prints, which would otherwise swamp the results."""
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+        yield
+
+def timed(function, repeat, setup=None):
+    """Runs function repeat times, after setup each time, and returns its median and fastest time."""
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        with quiet():
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    return {"median_ms": round(statistics.median(times) * 1000, 2), "min_ms": round(min(times) * 1000, 2)}
+
+def run_benchmarks(repeat):
+    from anno_app import anno_cache
+    from anno_app.anno_store import open_store, parse_note_content
+    from anno_app.anno_markup import parse_markup
+    from anno_app.anno_utils import export_notes, backup_notes, list_backups, restore_notes, BACKUP_DIR
+    from anno_app.anno_terminal_viewer import (get_all_notes, search_and_display_notes,
+                                               search_text_and_display_notes, apply_terminal_styling)
+
+    store = open_store()
+    contents = [note["content"] for note in store.load()]
+
+    def forget_cache():
+        anno_cache._caches.clear()
+
+    def drop_cache():
+        forget_cache()
+        try:
+            os.remove(anno_cache.open_cache(store).path)
+        except FileNotFoundError:
+            pass
+        forget_cache()
+
+    def empty(path):
+        shutil.rmtree(path, ignore_errors=True)
+
+    export_dir = os.path.join(os.path.expanduser("~"), "export")
+    results = {}
+    results["parse_note_content"] = timed(lambda: [parse_note_content(c) for c in contents], repeat)
+    results["get_all_notes.cold"] = timed(get_all_notes, repeat, setup=drop_cache)
+    get_all_notes()
+    results["get_all_notes.cached"] = timed(get_all_notes, repeat, setup=forget_cache)
+    # The first searches build the indexes; it is the steady state that matters.
+    with quiet():
+        search_and_display_notes(SEARCH_TAG)
+        search_text_and_display_notes(SEARCH_TEXT)
+    results["search.tag"] = timed(lambda: search_and_display_notes(SEARCH_TAG), repeat)
+    results["search.text"] = timed(lambda: search_text_and_display_notes(SEARCH_TEXT), repeat)
+    results["apply_terminal_styling"] = timed(lambda: [apply_terminal_styling(c) for c in contents],
+                                              repeat, setup=parse_markup.cache_clear)
+    results["export.full"] = timed(lambda: export_notes(export_dir), repeat, setup=lambda: empty(export_dir))
+    results["export.unchanged"] = timed(lambda: export_notes(export_dir), repeat)
+    results["backup.full"] = timed(backup_notes, repeat, setup=lambda: empty(BACKUP_DIR))
+    results["backup.unchanged"] = timed(backup_notes, repeat)
+    results["restore"] = timed(lambda: restore_notes(list_backups()[0]), repeat)
+
+    viewer = headless_viewer()
+    if viewer is not None:
+        notes = get_all_notes()
+        results["gui.populate_tree"] = timed(lambda: viewer().populate_tree(notes), repeat)
+
+        def style_every_note():
+            app = viewer()
+            for content in contents:
+                app.apply_styling(content)
+                app.run_scheduled()
+        results["gui.apply_styling"] = timed(style_every_note, repeat, setup=parse_markup.cache_clear)
+    return results
+
+# --- Runs ---
+
+def measure(notes, backend, scratch, repeat):
+    """Writes notes into a scratch HOME for backend and returns the child process's results."""
+    home = os.path.join(scratch, backend)
+    write_store(notes, backend, home)
+    env = dict(os.environ, HOME=home, ANNO_BACKEND=backend, PYTHONPATH=ROOT)
+    # Nothing may be served by a daemon the user has running.
+    env.pop("XDG_RUNTIME_DIR", None)
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--measure", str(repeat)], env=env)
+    shutil.rmtree(home)
+    return json.loads(output)
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results, previous=None):
+    """Prints every timing, with its change from previous results when given."""
+    for size, backends in results.items():
+        for backend, timings in backends.items():
+            print(f"{size} notes, {backend}")
+            for name, timing in timings.items():
+                line = f"  {name:<24} {timing['median_ms']:10.2f}ms"
+                before = (previous or {}).get(size, {}).get(backend, {}).get(name)
+                if before and before["median_ms"]:
+                    line += f"   {timing['median_ms'] / before['median_ms'] - 1:+7.1%}"
+                print(line)
+
+# --- Script Entry Point ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time anno's hot paths on generated corpora.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated corpus sizes (1k, 10k, 100k, 1m or numbers).")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma-separated backends to measure.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs of each benchmark.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the corpus generator.")
+    parser.add_argument("--output", help="Where to write the results (default: bench/results/hotpaths-TIME.json).")
+    parser.add_argument("--compare", help="Earlier results file to compare against.")
+    parser.add_argument("--measure", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(run_benchmarks(args.measure)))
+        sys.exit(0)
+
+    backends = args.backends.split(",")
+    for backend in backends:
+        if backend not in BACKENDS:
+            parser.error(f"unknown backend: {backend}")
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+
+    results = {}
+    scratch = tempfile.mkdtemp(prefix="anno_hotpaths_")
+    try:
+        for size in args.sizes.split(","):
+            notes = generate_corpus(parse_size(size), args.seed)
+            results[size] = {backend: measure(notes, backend, scratch, args.repeat) for backend in backends}
+    finally:
+        shutil.rmtree(scratch)
+    print_results(results, previous)
+
+    output = args.output or os.path.join(BENCH_DIR, "results", time.strftime("hotpaths-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
@@ -0,0 +1,100 @@
+"""Measures the memory the viewers need to hold a large corpus of notes.
+
+Usage: python3 bench/memory.py [--notes N]
+
+Each note representation is built in its own child process from the same
+generated corpus. The script reports the bytes the representation keeps
+alive (measured with tracemalloc) and the peak RSS of the process.
+"""
+import os
+import sys
+import json
+import argparse
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anno_app.anno_store import parse_note_content
+from anno_app.anno_cache import Note
+from corpus import generate_corpus
+
+# --- Representations ---
+
+def build_dicts(raw_notes):
+    """The previous layout: a parsed dict per note plus the GUI's own dict with a body copy."""
+    records = []
+    for i, note in enumerate(raw_notes):
+        title, tags, body = parse_note_content(note["content"])
+        record = {
+            "timestamp": note["timestamp"],
+            "content": note["content"],
+            "title": title,
+            "tags": tags,
+            "body_start": len(note["content"]) - len(body),
+            "datetime": datetime.fromisoformat(note["timestamp"]),
+        }
+        records.append((record, {
+            "id": i,
+            "timestamp": record["timestamp"],
+            "datetime": record["datetime"],
+            "title": record["title"],
+            "tags": record["tags"],
+            "body": body,
+            "original_content": record["content"],
+        }))
+    return records
+
+def build_notes(raw_notes):
+    """The current layout: one slotted Note record per note."""
+    return [Note(note["id"], note["timestamp"], note["content"]) for note in raw_notes]
+
+REPRESENTATIONS = {"dicts": build_dicts, "notes": build_notes}
+
+def measure(representation, corpus_path):
+    """Runs in the child process; prints the measurements as JSON."""
+    with open(corpus_path) as f:
+        raw_notes = json.load(f)
+    tracemalloc.start()
+    kept = REPRESENTATIONS[representation](raw_notes)
+    # Only the notes' content should stay shared with the loaded file.
+    contents = [note["content"] for note in raw_notes]
+    del raw_notes
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(json.dumps({
+        "retained_bytes": retained - sys.getsizeof(contents),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "count": len(kept),
+    }))
+
+# --- Script Entry Point ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the memory used by note representations.")
+    parser.add_argument("--notes", type=int, default=100000, help="Number of notes to generate.")
+    parser.add_argument("--measure", choices=REPRESENTATIONS, help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.corpus)
+        sys.exit(0)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(generate_corpus(args.notes), f)
+        corpus_path = f.name
+    try:
+        print(f"{args.notes} notes")
+        results = {}
+        for name in REPRESENTATIONS:
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--measure", name, "--corpus", corpus_path])
+            results[name] = json.loads(output)
+            print(f"  {name:<6} retained {results[name]['retained_bytes'] / 2**20:8.1f} MiB   "
+                  f"peak RSS {results[name]['peak_rss_kb'] / 1024:8.1f} MiB")
+        saved = 1 - results["notes"]["retained_bytes"] / results["dicts"]["retained_bytes"]
+        print(f"  Note records keep {saved:.0%} less memory than dicts.")
+    finally:
+        os.remove(corpus_path)
@@ -0,0 +1,162 @@
+"""Measures how quickly each anno entry point starts, to catch cold-start regressions.
+
+Usage: python3 bench/startup.py [--notes N] [--runs N] [--json FILE]
+
+Every command runs through the `anno` script against the same generated
+corpus, in a scratch HOME. It runs once untimed, so the note cache and
+indexes exist, then --runs more times. The script reports the median wall
+time and the median time Python spent importing modules, measured with
+PYTHONPROFILEIMPORTTIME (what -X importtime prints), along with the slowest
+imports. It exits with status 1 if an entry point's import time goes over
+its budget in IMPORT_BUDGETS_MS.
+
+The GUI is only measured when a display is available. Its wall time runs
+until the first batch of notes is listed.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import compileall
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+ANNO = os.path.join(ROOT, "anno")
+sys.path.insert(0, ROOT)
+
+from corpus import generate_corpus, write_store
+
+# Milliseconds of imports each entry point may spend. Imports are far steadier
+# than wall time, which depends on the machine and on the corpus.
+IMPORT_BUDGETS_MS = {
+    "capture": 35,
+    "search": 45,
+    "search --text": 50,
+    "terminal": 50,
+    "export": 55,
+    "gui": 110,
+}
+SLOWEST_IMPORTS_SHOWN = 3
+
+# Edits the capture template into a note, standing in for the user's editor.
+CAPTURE_EDITOR = """#!/bin/sh
+printf 'Benchmark note\\n[#bench]\\nCaptured by bench/startup.py' > "$1"
+"""
+
+# Opens the GUI and closes it as soon as the first notes are listed.
+GUI_DRIVER = """
+from anno_app.anno_viewer import AnnotationViewer
+app = AnnotationViewer()
+def close_when_listed():
+    if app.tree.get_children(): app.destroy()
+    else: app.after(5, close_when_listed)
+app.after(0, close_when_listed)
+app.mainloop()
+"""
+
+def entry_points(scratch):
+    """Returns each measured command line, and what it reads from stdin."""
+    commands = {
+        "capture": ([ANNO], None),
+        "search": ([ANNO, "-s", "work"], None),
+        "search --text": ([ANNO, "-s", "--text", "review draft"], None),
+        "terminal": ([ANNO, "-t"], "/quit\n"),
+        "export": ([ANNO, "--export", os.path.join(scratch, "export")], None),
+    }
+    if os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"):
+        commands["gui"] = ([sys.executable, "-c", GUI_DRIVER], None)
+    return commands
+
+def parse_import_times(stderr):
+    """Returns the total import time and {module: cumulative µs} of the top-level imports."""
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented below the module importing them.
+        if not name.startswith("  "):
+            top_level[name.strip()] = top_level.get(name.strip(), 0) + int(cumulative)
+    return sum(top_level.values()), top_level
+
+def run(command, stdin, env):
+    start = time.perf_counter()
+    result = subprocess.run(command, input=stdin, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} failed:\n{result.stderr[-2000:]}")
+    return wall, parse_import_times(result.stderr)
+
+def measure(scratch, runs):
+    env = dict(os.environ, HOME=scratch, EDITOR=os.path.join(scratch, "editor"),
+               PYTHONPATH=ROOT, PYTHONPROFILEIMPORTTIME="1")
+    env.pop("ANNO_BACKEND", None)
+    env.pop("XDG_RUNTIME_DIR", None)
+    results = {}
+    for name, (command, stdin) in entry_points(scratch).items():
+        # The first run builds the note cache and the indexes.
+        run(command, stdin, env)
+        walls, imports, modules = [], [], {}
+        for _ in range(runs):
+            wall, (total, top_level) = run(command, stdin, env)
+            walls.append(wall)
+            imports.append(total)
+            for module, cumulative in top_level.items():
+                modules.setdefault(module, []).append(cumulative)
+        slowest = sorted(modules, key=lambda m: statistics.median(modules[m]), reverse=True)
+        results[name] = {
+            "wall_ms": round(statistics.median(walls) * 1000, 1),
+            "import_ms": round(statistics.median(imports) / 1000, 1),
+            "budget_ms": IMPORT_BUDGETS_MS.get(name),
+            "slowest_imports": {m: round(statistics.median(modules[m]) / 1000, 1)
+                                for m in slowest[:SLOWEST_IMPORTS_SHOWN]},
+        }
+    return results
+
+def prepare(scratch, notes):
+    """Writes the corpus and the stand-in editor into a scratch HOME."""
+    write_store(generate_corpus(notes), "json", scratch)
+    editor = os.path.join(scratch, "editor")
+    with open(editor, "w") as f:
+        f.write(CAPTURE_EDITOR)
+    os.chmod(editor, 0o755)
+
+# --- Script Entry Point ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the startup time of anno's entry points.")
+    parser.add_argument("--notes", type=int, default=10000, help="Number of notes to generate.")
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per entry point.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    # Installed copies ship precompiled bytecode; measure the same way.
+    compileall.compile_dir(os.path.join(ROOT, "anno_app"), quiet=1)
+    scratch = tempfile.mkdtemp(prefix="anno_startup_")
+    try:
+        prepare(scratch, args.notes)
+        results = measure(scratch, args.runs)
+    finally:
+        shutil.rmtree(scratch)
+
+    print(f"{args.notes} notes, median of {args.runs} runs")
+    print(f"  {'entry point':<14} {'wall':>9} {'imports':>9} {'budget':>8}   slowest imports")
+    over_budget = []
+    for name, result in results.items():
+        budget = result["budget_ms"]
+        if budget is not None and result["import_ms"] > budget:
+            over_budget.append(name)
+        slowest = ", ".join(f"{m} {ms:.1f}" for m, ms in result["slowest_imports"].items())
+        print(f"  {name:<14} {result['wall_ms']:7.1f}ms {result['import_ms']:7.1f}ms {budget or '-':>6}ms   {slowest}"
+              + ("   OVER BUDGET" if name in over_budget else ""))
+    if "gui" not in results:
+        print("  (gui skipped: no display)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"notes": args.notes, "runs": args.runs, "results": results}, f, indent=2)
+    sys.exit(1 if over_budget else 0)
@@ -0,0 +1,20 @@
+#!/bin/bash
+
+# Builds anno_deb_build.deb from the current sources.
+# The package's payload is copied in fresh on every build, so it always
+# holds the same anno script and modules as the repository. Bytecode is
+# left out: postinst compiles the modules once they are installed.
+
+set -e
+cd "$(dirname "${BASH_SOURCE[0]}")"
+
+PACKAGE_DIR="anno_deb_build"
+BIN_DIR="$PACKAGE_DIR/usr/local/bin"
+APP_DIR="$PACKAGE_DIR/usr/share/anno_app"
+
+rm -rf "$BIN_DIR" "$APP_DIR"
+mkdir -p "$BIN_DIR" "$APP_DIR"
+install -m 755 anno "$BIN_DIR/anno"
+install -m 644 anno_app/*.py "$APP_DIR/"
+
+dpkg-deb --root-owner-group --build "$PACKAGE_DIR"